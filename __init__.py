@@ -1,2 +1,6 @@
 from .processes import *
 from .drawing import Drawing
+from .sheet import Sheet
+from .transforms import transform
+from .inkscape import InkscapeQueue
+from .aio import render_async
@@ -0,0 +1,112 @@
+# Asyncio API: rendering runs in an executor, so it does not block the
+# event loop.
+#
+#     svg = await plotnik.render_async(scene, format='svg')
+#     await d.save_async('fig.png')
+#
+#     plotnik.aio.configure('process', workers=4, limit=8)
+#
+# Every executor has a semaphore: at most `limit` renders are submitted at a
+# time, the rest wait in the event loop and can be cancelled there. A render
+# that is already running is not interrupted; its slot is released when it
+# finishes.
+#
+# matplotlib rcParams and the global drawing are shared by all threads of a
+# process, so in a thread executor renders are serialized by RENDER_LOCK and
+# only free the event loop. Use a process executor to render in parallel.
+# save_async() always uses a thread executor, as the drawing lives in this
+# process.
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from .scene import render_bytes
+
+RENDER_LOCK = threading.Lock()
+
+
+class Executor:
+    def __init__(self, kind='thread', workers=None, limit=None):
+        workers = workers or os.cpu_count() or 1
+        if kind == 'thread':
+            self.executor = ThreadPoolExecutor(workers)
+        elif kind == 'process':
+            self.executor = ProcessPoolExecutor(workers)
+        else:
+            raise ValueError(f"Unknown executor kind '{kind}'")
+        self.kind = kind
+        self.limit = limit or workers
+        # asyncio.Semaphore binds to one event loop, so there is one per loop
+        # (asyncio.run() may be called several times)
+        self.semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self.semaphores:
+            self.semaphores[loop] = asyncio.Semaphore(self.limit)
+        return self.semaphores[loop]
+
+    async def run(self, fn, *args):
+        async with self._semaphore():
+            job = self.executor.submit(fn, *args)
+            try:
+                return await asyncio.shield(asyncio.wrap_future(job))
+            except asyncio.CancelledError:
+                # Drop the job if it has not started, otherwise keep the slot
+                # until it finishes so the limit still holds
+                if not job.cancel():
+                    await asyncio.wait([asyncio.wrap_future(job)])
+                raise
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+EXECUTORS = {}
+
+
+# Set the executor used by default: kind is 'thread' or 'process'
+def configure(kind='thread', workers=None, limit=None):
+    old = EXECUTORS.get('default')
+    EXECUTORS['default'] = Executor(kind, workers, limit)
+    if old is not None:
+        old.shutdown()
+    return EXECUTORS['default']
+
+
+def get_executor(kind=None):
+    if kind is None:
+        if 'default' not in EXECUTORS:
+            configure()
+        return EXECUTORS['default']
+    if kind not in EXECUTORS:
+        EXECUTORS[kind] = Executor(kind)
+    return EXECUTORS[kind]
+
+
+def _render_locked(scene, format, crop, dpi):
+    with RENDER_LOCK:
+        return render_bytes(scene, format, crop, dpi)
+
+
+def _save_locked(drawing, filename, kwargs):
+    with RENDER_LOCK:
+        drawing.save(filename, **kwargs)
+
+
+# Render a scene (see scene.py) to bytes. executor is an Executor, 'thread',
+# 'process' or None for the configured default.
+async def render_async(scene, format='svg', crop=False, dpi=None, executor=None):
+    if not isinstance(executor, Executor):
+        executor = get_executor(executor)
+    return await executor.run(_render_locked, scene, format, crop, dpi)
+
+
+async def save_async(drawing, filename, executor=None, **kwargs):
+    if not isinstance(executor, Executor):
+        executor = get_executor(executor)
+    if executor.kind != 'thread':
+        executor = get_executor('thread')
+    await executor.run(_save_locked, drawing, filename, kwargs)
@@ -0,0 +1,277 @@
+# Benchmarks for plotnik.
+#
+# Runs the README examples and a few stress cases and times every phase
+# separately: construction (Drawing, set_config, process objects),
+# add_process, show, save as SVG/PNG/PDF. Peak memory of each phase is
+# measured in a separate run with tracemalloc, so it does not affect timings.
+#
+#     python benchmarks/bench.py -o before.json
+#     python benchmarks/bench.py -o after.json --compare before.json
+#     python benchmarks/bench.py -k carnot -k stress_100 -r 10
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Import the package from this checkout whatever the directory is called
+def load_plotnik():
+    spec = importlib.util.spec_from_file_location(
+        'plotnik', os.path.join(ROOT, '__init__.py'),
+        submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['plotnik'] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+pn = load_plotnik()
+from plotnik.global_drawing import GLOBAL_DRAWING
+
+
+## Scenes. Each one gets an entered Drawing and creates its processes.
+
+# README example 1
+def isochore_adiabat_isotherm(d):
+    v1, v2, p1 = 3, 9, 9
+    d.set_config(xname='$V$', yname='$p$', zero_x=0.5, axes_arrow_width=0.23)
+    pn.Adiabatic().at(v1, p1).to(v2, 'volume').arrow().dot()
+    pn.Iso_t().to(v1, 'volume').arrow().dot().label(2, dy=0)
+    pn.Linear().to(v1, p1).arrow().dot().label(3, 1)
+
+# README example 3
+def carnot(d):
+    p1, v1, v2, v3 = 10, 3, 6, 10
+    d.set_config(fontsize=30, yname='$p$', xname='$V$', aspect=0.7,
+                 xlim=[0, 11], center=[5.5, 4.5])
+    T1 = pn.Iso_t().at(v1, p1).to(v2, 'volume').dot('both').label(1, 2)
+    p2 = T1.end[1]
+    A1 = pn.Adiabatic().to(v3, 'volume')
+    v4, p4 = pn.common_pv(v1, p1, v3, A1.end[1])
+    pn.Iso_t().to(v4, 'volume').dot('both').label(3, 4)
+    pn.Adiabatic().to(v1, 'volume')
+    pn.Power(15).at(v2, p2).to(v4, p4)
+    d.ax.text(4.75, 4.8, '$A_1$', fontsize=24)
+    d.ax.text(5.65, 3.9, '$A_2$', fontsize=24)
+
+# README example 4
+def bezier(d):
+    d.set_config(yname=r'$x$', xname=r'$t$', xlim=[0, 12], center_x=5)
+    B = pn.Bezier(x1=5, y1=15, x2=6.8, y2=-4).at(1, 7).to(11, 3).lw(2.4)
+    pn.State().at(*B.get_point(4)).dot().label('A')
+    pn.State().at(*B.get_point(18)).dot().label('B', dx=0)
+    pn.State().at(*B.get_point(48)).dot().label('C')
+    pn.State().at(*B.get_point(91)).dot().label('D')
+
+# README example 9
+def power(d):
+    v1, u1, v2 = 8, 6, 3.5
+    d.set_config(fontsize=31, yname='$U$', xname='$V$', ylim=[0, 7.4],
+                 axes_arrow_length=1.1, center=[10, 0])
+    P1 = pn.Power().at(v1, u1).to(v2, 'x').arrow().label(1, 2).dot('both').tox().toy()
+    pn.Power().to(0, 0).ls('--')
+    d.ax.set_xticks([v1, v2], ['$V_1$', '$V_2$'])
+    d.ax.set_yticks([u1, P1.end[1]], ['$U_1$', '$U_2$'])
+
+# README example 11
+def grid_customisation(d):
+    d.set_config(yname='$B,$Тл', xname='$t,$с', xlim=[0, 6.3], xname_x=5,
+                 yname_y=0.26, ylim=[0, 0.27], zero_x=0.3,
+                 axes_arrow_scale=1.5, aspect=20)
+    d.ax.plot([0, 2, 4], [0, 0.2, 0], 'k-', lw=2.5)
+    d.ax.set_yticks([0.1, 0.2], ['0,1', '0,2'])
+    d.ax.set_xticks([1, 2, 3, 4])
+    d.grid(step_x=1, step_y=0.05, x_end=4.2, y_end=0.21, lw=2, color='#333333')
+
+# README example 12
+def tangent_isotherm(d):
+    p1, v1, p2, v2 = 3, 1, 1, 4
+    a = (p1 - p2) / (v1 - v2)
+    b = p1 - a * v1
+    vm = -b / (2 * a)
+    pm = a * vm + b
+    d.set_config(fontsize=24, yname='$p$', xname='$V$', xlim=[0, 5],
+                 ylim=[0, 4], zero_ofst=[0.2, 0.38])
+    pn.Linear().at(v1, p1).to(v2, p2).arrow(pos=0.3).dot('both').label(1, 2).toy().tox()
+    pn.State().at(vm, pm).dot().tox().toy()
+    pn.Iso_t().at(vm, pm).to(v1 * 1.35, 'volume').lw(1.4).col('#EE3344')
+    pn.Iso_t().at(vm, pm).to(v2 * 1.16, 'volume').lw(1.4).col('#EE3344')
+    d.ax.set_yticks([p1, p2, pm], ['$p_1$', '$p_2$', r'$p_\text{м}$'])
+    d.ax.set_xticks([v1, v2, vm], ['$V_1$', '$V_2$', r'$V\!_\text{м}$'])
+    d.grid(step=.5, y_end=3.5, x_end=4.5, color='#dddddd')
+
+# 100 chained processes with arrows and dots
+def stress_100_processes(d):
+    d.set_config(xname='$V$', yname='$p$', xlim=[0, 11], ylim=[0, 11])
+    pn.Linear().at(1, 1).to(1.5, 10).arrow().dot()
+    for i in range(99):
+        x = 1.5 + 0.09 * (i + 1)
+        if i % 3 == 0:
+            pn.Iso_t().to(x, 'volume').arrow().dot()
+        elif i % 3 == 1:
+            pn.Adiabatic().to(x, 'volume').arrow().dot()
+        else:
+            pn.Linear().to(x, 10 - 0.09 * i).arrow().dot()
+
+# Grid with 0.1 step on the default 11.2 x 11.2 axes
+def stress_fine_grid(d):
+    d.set_config(xname='$V$', yname='$p$')
+    pn.Iso_t().at(2, 10).to(10, 'volume').arrow().dot('both')
+    d.grid(step=0.1, x_end=11, y_end=11)
+
+# 50 ticks on every axis
+def stress_50_ticks(d):
+    d.set_config(xname='$V$', yname='$p$', xlim=[0, 51], ylim=[0, 51],
+                 fontsize=12)
+    pn.Linear().at(1, 1).to(50, 50).arrow().dot('both')
+    d.add_xticks(list(range(1, 51)))
+    d.add_yticks(list(range(1, 51)))
+
+# Labels rendered by LaTeX (font='serif' switches text.usetex on)
+def stress_usetex(d):
+    d.set_config(font='serif', xname='$V$', yname='$p$')
+    pn.Iso_t().at(2, 10).to(8, 'volume').arrow().dot('both').label(1, 2)
+    pn.Linear().to(2, 10 / 4).arrow().dot().label(3)
+    pn.Linear().to(2, 10).arrow()
+
+
+SCENES = {
+    'isochore_adiabat_isotherm': isochore_adiabat_isotherm,
+    'carnot': carnot,
+    'bezier': bezier,
+    'power': power,
+    'grid_customisation': grid_customisation,
+    'tangent_isotherm': tangent_isotherm,
+    'stress_100_processes': stress_100_processes,
+    'stress_fine_grid': stress_fine_grid,
+    'stress_50_ticks': stress_50_ticks,
+    'stress_usetex': stress_usetex,
+}
+
+PHASES = ['construction', 'add_process', 'show', 'save_svg', 'save_png', 'save_pdf']
+
+
+# Run a scene once. `measure(phase, fn)` wraps every phase.
+def run_scene(scene, outdir, measure):
+    d = pn.Drawing()
+    try:
+        def construct():
+            d.__enter__()
+            scene(d)
+        measure('construction', construct)
+        measure('add_process', GLOBAL_DRAWING.release_processes)
+        measure('show', d.show)
+        for fmt in ('svg', 'png', 'pdf'):
+            filename = os.path.join(outdir, f'{scene.__name__}.{fmt}')
+            measure(f'save_{fmt}', lambda: d.save(filename))
+    finally:
+        if GLOBAL_DRAWING.drawing is d:
+            GLOBAL_DRAWING.reset()
+        plt.close('all')
+
+
+def time_scene(scene, outdir, repeat):
+    samples = {phase: [] for phase in PHASES}
+    for _ in range(repeat):
+        def measure(phase, fn):
+            t0 = time.perf_counter()
+            fn()
+            samples[phase].append(time.perf_counter() - t0)
+        run_scene(scene, outdir, measure)
+    return {phase: {'median': statistics.median(values), 'min': min(values)}
+            for phase, values in samples.items()}
+
+
+def memory_scene(scene, outdir):
+    peaks = {}
+    def measure(phase, fn):
+        tracemalloc.reset_peak()
+        fn()
+        peaks[phase] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.start()
+    try:
+        run_scene(scene, outdir, measure)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def run(names, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as outdir:
+        for name in names:
+            if name == 'stress_usetex' and shutil.which('latex') is None:
+                print(f'{name:28s} skipped: LaTeX is not installed')
+                continue
+            # Warm-up: font cache, mathtext parser, backends
+            run_scene(SCENES[name], outdir, lambda phase, fn: fn())
+            times = time_scene(SCENES[name], outdir, repeat)
+            peaks = memory_scene(SCENES[name], outdir)
+            results[name] = {phase: {**times[phase], 'peak_memory': peaks[phase]}
+                             for phase in PHASES}
+            total = sum(t['median'] for t in times.values())
+            print(f'{name:28s} {total * 1000:9.1f} ms')
+    return results
+
+
+def metadata():
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+    }
+
+
+# Print the ratio of medians new/old for every case and phase
+def compare(old, new):
+    print(f'\n{"case":28s} {"phase":12s} {"old, ms":>9s} {"new, ms":>9s} {"ratio":>7s}')
+    for name, phases in new['cases'].items():
+        if name not in old['cases']:
+            continue
+        for phase, value in phases.items():
+            before = old['cases'][name].get(phase)
+            if before is None:
+                continue
+            ratio = value['median'] / before['median'] if before['median'] else float('nan')
+            print(f'{name:28s} {phase:12s} {before["median"] * 1000:9.2f} '
+                  f'{value["median"] * 1000:9.2f} {ratio:7.2f}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark plotnik phases.')
+    parser.add_argument('-o', '--output', help='write results to a JSON file')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='timed runs per case (default 5)')
+    parser.add_argument('-k', dest='cases', action='append', choices=SCENES,
+                        help='run only this case (can be repeated)')
+    parser.add_argument('--compare', help='JSON file of a previous run')
+    args = parser.parse_args(argv)
+
+    report = {'meta': metadata(), 'cases': run(args.cases or list(SCENES), args.repeat)}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+# Command-line renderer:
+#
+#     python -m plotnik figures/ -o build/figures -f svg,png -j 4
+#     python -m plotnik figures/ -o build/figures --watch
+#
+# Renders scene files (.json, see scene.py) and plotnik scripts (.py) from a
+# directory into the same tree under the output directory. Files whose
+# outputs are up to date are skipped, by modification time (default) or by
+# content hash (--check hash).
+import argparse
+import hashlib
+import json
+import os
+import runpy
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+SOURCE_EXTENSIONS = ('.json', '.py')
+MANIFEST = '.plotnik-manifest.json'
+
+
+def find_sources(src):
+    if os.path.isfile(src):
+        return [os.path.basename(src)]
+    sources = []
+    for root, dirs, files in os.walk(src):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d != '__pycache__')
+        for name in sorted(files):
+            if name.endswith(SOURCE_EXTENSIONS) and name != '__init__.py':
+                sources.append(os.path.relpath(os.path.join(root, name), src))
+    return sources
+
+
+def output_paths(rel, outdir, formats):
+    base = os.path.join(outdir, os.path.splitext(rel)[0])
+    return [f'{base}.{fmt}' for fmt in formats]
+
+
+def source_hash(path, options):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        h.update(f.read())
+    h.update(repr(options).encode())
+    return h.hexdigest()
+
+
+def is_up_to_date(path, outputs, check, manifest_entry, digest):
+    if not all(os.path.exists(out) for out in outputs):
+        return False
+    if check == 'hash':
+        return manifest_entry == digest
+    source_mtime = os.path.getmtime(path)
+    return all(os.path.getmtime(out) >= source_mtime for out in outputs)
+
+
+# Render one source file. Runs in a worker process with -j > 1.
+def render_file(path, outbase, formats, crop=False, optimize=False, deterministic=False):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from .drawing import SHOW_HOOKS
+    from .global_drawing import GLOBAL_DRAWING
+    from .scene import load_scene, render_scene
+
+    t0 = time.perf_counter()
+    drawings = []
+    try:
+        if path.endswith('.json'):
+            drawings.append(render_scene(load_scene(path)))
+        else:
+            # Scripts run in their own directory, as when started by hand
+            cwd = os.getcwd()
+            SHOW_HOOKS.append(drawings.append)
+            try:
+                os.chdir(os.path.dirname(os.path.abspath(path)))
+                runpy.run_path(os.path.abspath(path), run_name='__main__')
+            finally:
+                os.chdir(cwd)
+                SHOW_HOOKS.remove(drawings.append)
+
+        if not drawings:
+            raise ValueError('no drawing was shown')
+        os.makedirs(os.path.dirname(outbase) or '.', exist_ok=True)
+        written = []
+        for i, d in enumerate(drawings):
+            if deterministic:
+                d.config['deterministic'] = True
+            suffix = '' if i == 0 else f'-{i + 1}'
+            for fmt in formats:
+                filename = f'{outbase}{suffix}.{fmt}'
+                with open(filename, 'wb') as f:
+                    d.save(f, format=fmt, crop=crop, optimize=optimize)
+                written.append(filename)
+        return written, time.perf_counter() - t0
+    finally:
+        # Leave the worker clean for the next file
+        GLOBAL_DRAWING.reset()
+        plt.close('all')
+
+
+class Renderer:
+    def __init__(self, src, outdir, formats, jobs=1, check='mtime', force=False, crop=False,
+                 optimize=False, deterministic=False):
+        self.src = src
+        self.outdir = outdir
+        self.formats = formats
+        self.check = check
+        self.force = force
+        self.crop = crop
+        self.optimize = optimize
+        self.deterministic = deterministic
+        self.executor = ProcessPoolExecutor(jobs) if jobs > 1 else None
+        self.manifest_path = os.path.join(outdir, MANIFEST)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def source_path(self, rel):
+        return self.src if os.path.isfile(self.src) else os.path.join(self.src, rel)
+
+    # Render the given sources (all by default). Returns the number of failures.
+    def run(self, sources=None):
+        if sources is None:
+            sources = find_sources(self.src)
+        options = (self.formats, self.crop, self.optimize, self.deterministic)
+
+        jobs = {}
+        for rel in sources:
+            path = self.source_path(rel)
+            outputs = output_paths(rel, self.outdir, self.formats)
+            digest = source_hash(path, options)
+            if not self.force and is_up_to_date(path, outputs, self.check,
+                                                self.manifest.get(rel), digest):
+                print(f'up to date  {rel}')
+                continue
+            outbase = os.path.splitext(outputs[0])[0]
+            args = (path, outbase, self.formats, self.crop, self.optimize,
+                    self.deterministic)
+            if self.executor is None:
+                jobs[rel] = (digest, args, None)
+            else:
+                jobs[rel] = (digest, args, self.executor.submit(render_file, *args))
+
+        failures = 0
+        for rel, (digest, args, future) in jobs.items():
+            try:
+                written, seconds = future.result() if future else render_file(*args)
+            except Exception as error:
+                failures += 1
+                self.manifest.pop(rel, None)
+                print(f'failed      {rel}: {type(error).__name__}: {error}', file=sys.stderr)
+                continue
+            self.manifest[rel] = digest
+            print(f'rendered    {rel} -> {", ".join(written)} ({seconds:.2f} s)')
+
+        if jobs:
+            os.makedirs(self.outdir, exist_ok=True)
+            with open(self.manifest_path, 'w') as f:
+                json.dump(self.manifest, f, indent=1, sort_keys=True)
+        return failures
+
+    # Poll the sources and re-render the files that changed
+    def watch(self, interval=0.5):
+        seen = {}
+        while True:
+            changed = []
+            for rel in find_sources(self.src):
+                try:
+                    mtime = os.path.getmtime(self.source_path(rel))
+                except OSError:
+                    # Deleted or being replaced (editors save by rename)
+                    seen.pop(rel, None)
+                    continue
+                if seen.get(rel) != mtime:
+                    seen[rel] = mtime
+                    changed.append(rel)
+            if changed:
+                self.run(changed)
+            time.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='plotnik', description='Render plotnik scenes (.json) and scripts (.py).')
+    parser.add_argument('src', help='source directory or file')
+    parser.add_argument('-o', '--output', default='build', help='output directory (default: build)')
+    parser.add_argument('-f', '--formats', default='svg',
+                        help='comma separated output formats (default: svg)')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='parallel jobs')
+    parser.add_argument('--check', choices=['mtime', 'hash'], default='mtime',
+                        help='how to detect unchanged sources (default: mtime)')
+    parser.add_argument('--force', action='store_true', help='render all files')
+    parser.add_argument('--crop', action='store_true', help='crop outputs to their content')
+    parser.add_argument('--optimize', action='store_true', help='write smaller SVG files')
+    parser.add_argument('--deterministic', action='store_true',
+                        help='byte-identical SVG/PDF files for identical drawings')
+    parser.add_argument('--watch', action='store_true', help='re-render files when they change')
+    args = parser.parse_args(argv)
+
+    renderer = Renderer(args.src, args.output, args.formats.split(','), args.jobs,
+                        args.check, args.force, args.crop, args.optimize,
+                        args.deterministic)
+    try:
+        if args.watch:
+            renderer.watch()
+            return 0
+        return 1 if renderer.run() else 0
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        renderer.close()
@@ -1,10 +1,30 @@
+import io
+from contextlib import contextmanager, nullcontext
+import os
 import subprocess
 import matplotlib.pyplot as plt
 from matplotlib import rcParams
+from matplotlib import animation
 from matplotlib.patches import FancyArrowPatch
 import numpy as np
-from .processes import Process
+from .processes import Process, uniform_positions
 from .global_drawing import GLOBAL_DRAWING
+from .interactive import Editor
+from .profiling import Stats, NO_PHASE
+from .markers import Markers
+from .labels import place_labels
+from .svgopt import optimize_svg
+from .tikz import tikz_code
+from .preview import preview
+from .inkscape import ACTIVE_QUEUES, crop_actions
+
+# Functions called as hook(drawing) at every show(). The command-line
+# renderer uses it to collect drawings of plotnik scripts.
+SHOW_HOOKS = []
+
+# savefig() metadata without creation dates, for deterministic output
+DETERMINISTIC_METADATA = {'svg': {'Date': None},
+                          'pdf': {'CreationDate': None, 'ModDate': None}}
 
 class Drawing:
     def __init__(self):
@@ -35,10 +55,27 @@ class Drawing:
                        'center': None,
                        'y_gap': None,
                        'y_gap_size': 0.05,
+                       'label_placement': None,   # 'auto' to avoid overlaps of labels
+                       'samples': 'keep',         # 'float32' or 'drop' samples of drawn curves
+                       'resolution': None,        # dpi of the output, sets samples per curve
+                       'tolerance': None,         # or max deviation of curves in points
+                       'svg_precision': 2,        # decimals of coordinates in optimized SVG
+                       'svg_tolerance': 0.1,      # simplification of lines in optimized SVG, in points
+                       'deterministic': False,    # byte-identical SVG/PDF for identical drawings
+                       'preview': 'draft',        # Jupyter preview: 'draft' (PNG) or 'final' (SVG)
+                       'preview_dpi': 60,         # dpi of draft previews
                        }
         self.grid_config = {}  # Initialization of grid_config as an empty dictionary.
         self.fig = None
         self.ax = None
+        self.processes = []  # Processes added to the drawing
+        self.markers = Markers()  # Dots of all processes
+        self.auto_labels = []     # Labels without explicit offsets
+        self.editor = None
+        self.stats = None    # Render statistics, see profile()
+        self.sheet = None    # Sheet the drawing is a cell of
+        self.id_prefix = ''  # Prefix of element ids in SVG output
+        self.rendered = False  # Set by show()
 
     def __enter__(self):
         GLOBAL_DRAWING.set(self)
@@ -47,7 +84,8 @@ class Drawing:
     def __exit__(self, exc_type, exc_val, exc_tb):
         if GLOBAL_DRAWING.drawing is self:
             GLOBAL_DRAWING.release_drawing()
-        plt.close(self.fig)
+        if self.sheet is None:
+            plt.close(self.fig)
 
     def __iadd__(self, process):
         self.add_process(process)
@@ -89,7 +127,10 @@ class Drawing:
             })
 
         # Create figure and axes
-        self.fig, self.ax = plt.subplots()
+        if self.sheet is None:
+            self.fig, self.ax = plt.subplots()
+        else:
+            self.fig, self.ax = self.sheet._cell_axes(self)
 
         # Hide standard spines of a figure
         self.ax.spines['top'].set_visible(False)
@@ -104,9 +145,25 @@ class Drawing:
         self.ax.set_xticks([])
         self.ax.set_yticks([])
         
+    # Enable render profiling. Phase timings, artist counts and the number
+    # of drawn texts are collected in d.stats. The callback, if given, is
+    # called as callback(name, seconds, info) after every phase.
+    def profile(self, callback=None):
+        if self.stats is None:
+            self.stats = Stats()
+        if callback is not None:
+            self.stats.subscribe(callback)
+        return self
+
+    def _phase(self, name, **info):
+        if self.stats is None:
+            return NO_PHASE
+        return self.stats.phase(name, **info)
+
     def set_config(self, **kwargs):
         self.config.update(kwargs)
-        self.update_rcParams()
+        with self._phase('update_rcParams'):
+            self.update_rcParams()
         
         ## Set the axes limits if they have been specified.
         #if 'xlim' in kwargs:
@@ -115,6 +172,10 @@ class Drawing:
             #self.ax.set_ylim(kwargs['ylim'])
 
     def add_process(self, process):
+        with self._phase('add_process', process=type(process).__name__):
+            self._add_process(process)
+
+    def _add_process(self, process):
         if self.ax is None:
             raise Exception("Axes not initialized.") 
         process.config = self.config  # Set config for the process
@@ -125,19 +186,27 @@ class Drawing:
 
         # Plot the process
         process.plot(self.ax, self.config)
+        if self.config['samples'] != 'keep':
+            process.compact(self.config['samples'])
+        self.markers.add_process(process)
+        self.processes.append(process)
+        for position, text in (process.label_artists or {}).items():
+            if getattr(process, position + '_label')['ofst'] is None:
+                point = process.start if position == 'start' else process.end
+                self.auto_labels.append((process, point, text))
 
         # Add labels
-        if hasattr(process, 'start_ytick_label'):
+        if process.start_ytick_label is not None:
             self._add_ytick_label(process.start[1], process.start_ytick_label)
-        if hasattr(process, 'end_ytick_label'):
+        if process.end_ytick_label is not None:
             self._add_ytick_label(process.end[1], process.end_ytick_label)
-        if hasattr(process, 'start_xtick_label'):
+        if process.start_xtick_label is not None:
             self._add_xtick_label(process.start[0], process.start_xtick_label)
-        if hasattr(process, 'end_xtick_label'):
+        if process.end_xtick_label is not None:
             self._add_xtick_label(process.end[0], process.end_xtick_label)
         
         # Add aditional lines (tox, toy, tozero)
-        for line_type, line_part, color, ls, lw in process.extra_lines:
+        for line_type, line_part, color, ls, lw in process.extra_lines or ():
             start_x, start_y = process.start if process.start else (None, None)
             end_x, end_y = process.end if process.end else (None, None)
 
@@ -355,10 +424,84 @@ class Drawing:
             self.ax.plot([start, 0], [y, y], 'k-', clip_on=False, linewidth=self.config['lw'] * 0.8)
 
 
-    def show(self):
+    # Use edit=True to drag process endpoints and Bezier control points with
+    # the mouse. Resulting coordinates are printed when the window is closed.
+    def show(self, edit=False):
+        self._render()
+
+        for hook in SHOW_HOOKS:
+            hook(self)
+
+        if edit:
+            self.editor = Editor(self)
+        if not edit and 'inline' in plt.get_backend():
+            # Jupyter: show the cached preview instead of rendering the
+            # figure again at the end of the cell
+            from IPython.display import display
+            display(self)
+            plt.close(self.fig)
+            return
+        plt.show()
+        if edit:
+            print(self.editor.code())
+
+    # Rich display in Jupyter, see preview.py
+    def _repr_svg_(self):
+        data = preview(self, 'svg')
+        return data.decode('utf-8') if data is not None else None
+
+    def _repr_png_(self):
+        return preview(self, 'png')
+
+    # Drawings with processes: the drawing itself, or the cells of a Sheet
+    def _drawings(self):
+        return [self]
+
+    # Everything show() builds before the figure is displayed
+    def _render(self):
         if GLOBAL_DRAWING.drawing is self:
             GLOBAL_DRAWING.release_processes()
 
+        with self._phase('markers'):
+            self.markers.draw(self.ax)
+        with self._phase('axes'):
+            self._build_axes()
+        if self.config.get('label_placement') == 'auto':
+            with self._phase('labels'):
+                place_labels(self, self.auto_labels)
+        self._set_ids()
+        self.rendered = True
+        if self.stats is not None:
+            self.stats.count_artists(self.fig)
+
+    # Dots and element ids of a drawing saved without show(): processes used
+    # to draw their dots at once, now the Markers of all processes are drawn
+    # here (again at every save, as processes may have been added)
+    def _draw_markers(self):
+        if not self.rendered:
+            self.markers.draw(self.ax)
+            self._set_ids()
+
+    # Stable element ids in SVG output: process-<n>-line, process-<n>-arrow,
+    # process-<n>-label-start/end (n counts processes from 1), dots-<n>, and
+    # figure-background and axes-background, which crop=True removes. Cells
+    # of a Sheet prefix them with cell-<row>-<col>-.
+    def _set_ids(self):
+        prefix = self.id_prefix
+        self.fig.patch.set_gid('figure-background')
+        self.ax.patch.set_gid(prefix + 'axes-background')
+        for i, process in enumerate(self.processes, 1):
+            if process.line is not None:
+                process.line.set_gid(f'{prefix}process-{i}-line')
+            if process.arrow_patch is not None:
+                process.arrow_patch.set_gid(f'{prefix}process-{i}-arrow')
+            for position, text in (process.label_artists or {}).items():
+                text.set_gid(f'{prefix}process-{i}-label-{position}')
+        for collection in self.markers.artists():
+            collection.set_gid(prefix + collection.get_gid())
+
+    # Axes with arrows, axes names, zero and grid
+    def _build_axes(self):
         xlen = self.config['xlim'][1] - self.config['xlim'][0]
         ylen = self.config['ylim'][1] - self.config['ylim'][0]
         lw = self.config['lw']*0.8
@@ -534,7 +677,8 @@ class Drawing:
         # Draw grid
         # Essential to do it before xname, yname, otherwise they may be shifted
         if self.config.get('grid', False):
-            self._add_grid()
+            with self._phase('axes/grid'):
+                self._add_grid()
 
         # Add axis labels xname, yname. If xname_ofst, yname_ofst are not
         # specified, then yname is vertically aligned with ylabels, and xname
@@ -650,18 +794,247 @@ class Drawing:
                              fontsize=self.config['fontsize'], ha='right',
                              va='baseline')
 
-        plt.show()
+    # filename can also be a writable binary stream, then format sets the
+    # file format ('svg' by default) and crop is done in memory.
+    # optimize=True writes a smaller SVG (see svgopt.py), crop is then done
+    # in memory too.
+    def save(self, filename, format=None, **kwargs):
+        if hasattr(filename, 'write'):
+            self._write(filename, format or 'svg', kwargs.get('crop', False),
+                        kwargs.get('dpi'), kwargs.get('optimize', False))
+            return
+
+        if (format or os.path.splitext(str(filename))[1][1:]) == 'tikz':
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(self._tikz())
+            return
+
+        if kwargs.get('optimize', False):
+            format = format or os.path.splitext(str(filename))[1][1:] or 'svg'
+            with open(filename, 'wb') as f:
+                self._write(f, format, kwargs.get('crop', False), kwargs.get('dpi'), True)
+            return
 
-    def save(self, filename, **kwargs):
         plt.margins(x=0, y=0, tight=True)
-        self.fig.savefig(filename, bbox_inches='tight')
+        self._savefig(filename, format=format, bbox_inches='tight')
 
         # Trim whitespace using Inkscape if 'crop' is specified and True
         if kwargs.get('crop', False):
-            inkscape_command = [
-                'inkscape', 
-                '--actions', 
-                'select-by-id:patch_1,patch_2;delete;select-all:all;fit-canvas-to-selection;export-filename:' + filename + ';export-do;', 
-                filename
-            ]
+            return self._crop(filename)
+
+    # save() in an executor, so it does not block the event loop:
+    #
+    #     await d.save_async('fig.svg', crop=True)
+    #
+    # See aio.py for executors and concurrency limits.
+    async def save_async(self, filename, executor=None, **kwargs):
+        from .aio import save_async
+        await save_async(self, filename, executor, **kwargs)
+
+    # The figure as bytes, without temporary files:
+    #
+    #     svg = d.to_bytes('svg', crop=True)
+    def to_bytes(self, format='svg', crop=False, dpi=None, optimize=False):
+        buffer = io.BytesIO()
+        self._write(buffer, format, crop, dpi, optimize)
+        return buffer.getvalue()
+
+    # In-memory counterpart of the Inkscape crop: the figure and axes
+    # backgrounds are hidden and the figure is cut
+    # to its content. PNG is trimmed exactly to the drawn pixels.
+    # bbox is a precomputed bounding box (save_all), 'tight' by default.
+    def _write(self, stream, format, crop=False, dpi=None, optimize=False, bbox=None):
+        if format == 'tikz':
+            stream.write(self._tikz().encode('utf-8'))
+            return
+
+        if optimize and format == 'svg':
+            buffer = io.BytesIO()
+            self._write(buffer, format, crop, dpi, bbox=bbox)
+            with self._phase('optimize'):
+                stream.write(optimize_svg(buffer.getvalue(),
+                                          self.config['svg_precision'],
+                                          self.config['svg_tolerance']))
+            return
+
+        plt.margins(x=0, y=0, tight=True)
+        kwargs = {'format': format, 'bbox_inches': 'tight' if bbox is None else bbox}
+        if dpi is not None:
+            kwargs['dpi'] = dpi
+        if not crop:
+            self._savefig(stream, **kwargs)
+            return
+
+        with self._hidden_backgrounds():
+            if format != 'png':
+                self._savefig(stream, pad_inches=0, **kwargs)
+                return
+            from PIL import Image
+            buffer = io.BytesIO()
+            self._savefig(buffer, pad_inches=0, **kwargs)
+            buffer.seek(0)
+            with self._phase('crop'):
+                with Image.open(buffer) as image:
+                    box = image.getchannel('A').getbbox()
+                    cropped = image.crop(box) if box else image
+                    cropped.save(stream, format='png', dpi=image.info.get('dpi'))
+
+    @contextmanager
+    def _hidden_backgrounds(self):
+        backgrounds = [self.fig.patch] + [ax.patch for ax in self.fig.axes]
+        visible = [patch.get_visible() for patch in backgrounds]
+        for patch in backgrounds:
+            patch.set_visible(False)
+        try:
+            yield
+        finally:
+            for patch, flag in zip(backgrounds, visible):
+                patch.set_visible(flag)
+
+    # TikZ code of the figure, see tikz.py
+    def _tikz(self):
+        self._draw_markers()
+        with self._phase('tikz'):
+            return tikz_code(self, self.config['svg_tolerance'])
+
+    def _savefig(self, filename, **kwargs):
+        self._draw_markers()
+        with self._phase('savefig', filename=filename):
+            with self._deterministic(filename, kwargs):
+                if self.stats is None:
+                    self.fig.savefig(filename, **kwargs)
+                else:
+                    with self.stats.count_texts(self.fig):
+                        self.fig.savefig(filename, **kwargs)
+                    self.stats.count_artists(self.fig)
+
+    # With set_config(deterministic=True) clip path and marker ids use a
+    # fixed hash salt and no dates are written, so identical drawings give
+    # byte-identical files
+    def _deterministic(self, filename, kwargs):
+        if not self.config['deterministic']:
+            return nullcontext()
+        format = kwargs.get('format')
+        if format is None and isinstance(filename, (str, os.PathLike)):
+            format = os.path.splitext(str(filename))[1][1:].lower()
+        metadata = DETERMINISTIC_METADATA.get(format or rcParams['savefig.format'])
+        if metadata is not None:
+            kwargs['metadata'] = {**metadata, **kwargs.get('metadata', {})}
+        return plt.rc_context({'svg.hashsalt': 'plotnik'})
+
+    # Crop with Inkscape, in the InkscapeQueue of an enclosing with block if
+    # there is one (returns its future)
+    def _crop(self, filename):
+        backgrounds = ['figure-background'] + [ax.patch.get_gid() for ax in self.fig.axes
+                                               if ax.patch.get_gid()]
+        if ACTIVE_QUEUES:
+            return ACTIVE_QUEUES[-1].crop(filename, backgrounds)
+        inkscape_command = [
+            'inkscape', 
+            '--actions', 
+            crop_actions(filename, backgrounds),
+            filename
+        ]
+        with self._phase('crop', filename=filename):
             subprocess.run(inkscape_command)
+
+    # Tight bounding box of the figure, as savefig(bbox_inches='tight')
+    # computes it, but only once for all formats
+    def _tight_bbox(self, pad_inches=None):
+        if pad_inches is None:
+            pad_inches = rcParams['savefig.pad_inches']
+        with self._phase('tight_bbox'):
+            renderer = self.fig.canvas.get_renderer()
+            bbox = self.fig.get_tightbbox(renderer)
+        return bbox.padded(pad_inches)
+
+    # Save several formats at once:
+    #
+    #     d.save_all({'svg': 'fig.svg', 'pdf': 'fig.pdf', 'tikz': 'fig.tikz',
+    #                 'png': [('fig.png', 300), ('thumb.png', 50)]})
+    #
+    # The tight bounding box is computed once and reused for every format.
+    # PNG files at several DPIs are rendered once at the highest DPI and
+    # downsampled. crop=True crops every format in memory, as to_bytes().
+    def save_all(self, targets, crop=False):
+        self._draw_markers()
+        plt.margins(x=0, y=0, tight=True)
+        if crop:
+            # The cropped outputs are cut to the content without backgrounds
+            with self._hidden_backgrounds():
+                bbox = self._tight_bbox(pad_inches=0)
+        else:
+            bbox = self._tight_bbox()
+
+        for fmt, target in targets.items():
+            if fmt == 'png':
+                self._save_pngs(target, bbox, crop)
+                continue
+            with open(target, 'wb') as f:
+                self._write(f, fmt, crop, bbox=bbox)
+
+    def _save_pngs(self, targets, bbox, crop=False):
+        if isinstance(targets, (str, os.PathLike, tuple)):
+            targets = [targets]
+        targets = [(t, self.fig.dpi) if not isinstance(t, tuple) else t for t in targets]
+        targets = sorted(targets, key=lambda t: t[1], reverse=True)
+
+        # Rasterize once at the highest DPI
+        filename, max_dpi = targets[0]
+        with open(filename, 'wb') as f:
+            self._write(f, 'png', crop, max_dpi, bbox=bbox)
+        if len(targets) == 1:
+            return
+
+        from PIL import Image
+        with self._phase('downsample'):
+            with Image.open(filename) as image:
+                image.load()
+                for filename, dpi in targets[1:]:
+                    size = (max(round(image.width * dpi / max_dpi), 1),
+                            max(round(image.height * dpi / max_dpi), 1))
+                    image.resize(size, Image.LANCZOS).save(filename, dpi=(dpi, dpi))
+
+    # Animate a state point moving along the processes of `path`. Positions
+    # are precomputed equally spaced by arc length. If filename is set, the
+    # frames are streamed to a GIF, MP4 or APNG file, otherwise the
+    # FuncAnimation is returned (e.g. for a notebook). Call after d.show().
+    def animate(self, path, frames=100, fps=25, filename=None, dpi=None,
+                size=12, color='k', marker='o', zorder=6):
+        if isinstance(path, Process):
+            path = [path]
+        x_values, y_values = uniform_positions(path, frames,
+                                               self.config.get('aspect', 1))
+
+        point, = self.ax.plot([x_values[0]], [y_values[0]], marker=marker,
+                              markersize=size, color=color, zorder=zorder,
+                              linestyle='', animated=True, clip_on=False)
+
+        def update(i):
+            point.set_data([x_values[i]], [y_values[i]])
+            return point,
+
+        anim = animation.FuncAnimation(self.fig, update, frames=frames,
+                                       interval=1000 / fps, blit=True,
+                                       cache_frame_data=False)
+        if filename is None:
+            return anim
+        anim.save(filename, writer=self._animation_writer(filename, fps), dpi=dpi)
+        # Keep later d.save() calls free of the moving point
+        point.remove()
+
+    # ffmpeg gets the frames through a pipe one by one, so memory does not
+    # grow with the number of frames. Pillow is only a fallback for GIF and
+    # APNG when ffmpeg is not installed; it keeps all frames in memory.
+    def _animation_writer(self, filename, fps):
+        ext = os.path.splitext(filename)[1].lower()
+        if animation.FFMpegWriter.isAvailable():
+            if ext in ('.png', '.apng'):
+                # matplotlib picks the codec by suffix and would use h264 for
+                # .png, which the apng muxer rejects
+                return animation.FFMpegWriter(fps=fps, codec='apng',
+                                              extra_args=['-f', 'apng', '-plays', '0'])
+            return animation.FFMpegWriter(fps=fps)
+        if ext in ('.gif', '.png', '.apng'):
+            return animation.PillowWriter(fps=fps)
+        raise ValueError(f"Saving '{ext}' animations requires ffmpeg.")
@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+
+# Samples of curves and arrow positions shared by all drawings of a Python
+# process. Variants of a problem and parameter sweeps draw the same
+# processes again and again; a process with the same type, parameters,
+# end points and sampling settings is then looked up instead of evaluated.
+#
+#     from plotnik.geometry import GEOMETRY_CACHE
+#     GEOMETRY_CACHE.stats()        # {'hits': ..., 'misses': ..., ...}
+#     GEOMETRY_CACHE.resize(0)      # disable
+#
+# The least recently used entries are dropped beyond `size`. Cached arrays
+# are read-only, as they are shared by processes. The cache is shared by
+# threads too (aio, server), so every access holds its lock.
+
+
+class GeometryCache:
+    def __init__(self, size=2048):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        if key is None:
+            return None
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if key is None or self.size <= 0:
+            return value
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return value
+
+    def resize(self, size):
+        with self.lock:
+            self.size = size
+            while len(self.entries) > max(size, 0):
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self.entries), 'size': self.size}
+
+
+GEOMETRY_CACHE = GeometryCache()
@@ -31,6 +31,11 @@ class GlobalDrawing:
 
         return drawing
 
+    # Forget the drawing and its processes, e.g. after a failed render
+    def reset(self):
+        self.drawing = None
+        self.processes = []
+
     def last_point(self):
         if self.drawing is None:
             raise ValueError("Global drawing is not set")
@@ -0,0 +1,188 @@
+import os
+import queue
+import subprocess
+import threading
+from concurrent.futures import Future
+
+# Inkscape for many files, without starting it for every file:
+#
+#     with InkscapeQueue(workers=2) as inkscape:
+#         for i, d in enumerate(drawings):
+#             d.save(f'fig{i}.svg', crop=True)      # cropped in the queue
+#         inkscape.convert('fig0.svg', 'fig0.emf')
+#         inkscape.convert('fig0.svg', 'fig0.pdf', text_to_path=True)
+#     # all files are done here, the first error is raised
+#
+# Every worker keeps one `inkscape --shell` running and sends it one line of
+# actions per file. Jobs are taken from a common queue, results come back as
+# futures. A worker whose Inkscape exits or does not answer within `timeout`
+# seconds starts a new one and tries the job again (`retries` times).
+#
+# Inside the with block Drawing.save(..., crop=True) sends its crop to the
+# queue and returns at once.
+
+# Queues of the enclosing with blocks, the innermost last
+ACTIVE_QUEUES = []
+
+PROMPT = b'> '
+
+
+# Actions that delete the backgrounds (by id) and fit the page to the rest
+def crop_actions(filename, ids):
+    return ('select-by-id:' + ','.join(ids) + ';delete;select-all:all;'
+            'fit-canvas-to-selection;export-filename:' + filename + ';export-do;')
+
+
+def convert_actions(filename, text_to_path=False):
+    text = 'export-text-to-path;' if text_to_path else ''
+    return text + 'export-filename:' + filename + ';export-do;'
+
+
+# One `inkscape --shell` process
+class InkscapeWorker:
+    def __init__(self, command='inkscape', timeout=60):
+        self.command = command
+        self.timeout = timeout
+        self.process = None
+        self.start()
+
+    def start(self):
+        self.process = subprocess.Popen([self.command, '--shell'], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self.output = queue.Queue()
+        self.buffer = b''
+        threading.Thread(target=self._read, args=(self.process.stdout, self.output),
+                         daemon=True).start()
+        self._answer()
+
+    # Output chunks of the process, None at the end
+    @staticmethod
+    def _read(stream, output):
+        for chunk in iter(lambda: os.read(stream.fileno(), 4096), b''):
+            output.put(chunk)
+        output.put(None)
+
+    # Output up to the next prompt
+    def _answer(self):
+        while PROMPT not in self.buffer:
+            try:
+                chunk = self.output.get(timeout=self.timeout)
+            except queue.Empty:
+                raise TimeoutError(f'Inkscape did not answer in {self.timeout} s') from None
+            if chunk is None:
+                raise RuntimeError(f'Inkscape exited with code {self.process.wait()}')
+            self.buffer += chunk
+        answer, _, self.buffer = self.buffer.partition(PROMPT)
+        return answer.decode(errors='replace')
+
+    def run(self, actions):
+        self.process.stdin.write(actions.encode() + b'\n')
+        self.process.stdin.flush()
+        return self._answer()
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.write(b'quit\n')
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+
+class InkscapeQueue:
+    def __init__(self, workers=1, command='inkscape', timeout=60, retries=1):
+        self.command = command
+        self.timeout = timeout
+        self.retries = retries
+        self.jobs = queue.Queue()
+        self.futures = []
+        self.threads = [threading.Thread(target=self._work, daemon=True)
+                        for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def __enter__(self):
+        ACTIVE_QUEUES.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        ACTIVE_QUEUES.remove(self)
+        try:
+            if exc_type is None:
+                self.wait()
+        finally:
+            self.close()
+
+    # Open `filename`, run the actions, close it. Returns a future of `result`
+    # (filename by default), which fails if `result` is not a file then.
+    # With `replace`, `result` is moved over `replace` on success.
+    def submit(self, filename, actions, result=None, replace=None):
+        future = Future()
+        self.futures.append(future)
+        self.jobs.put((f'file-open:{filename};{actions}file-close', future,
+                       result or filename, replace))
+        return future
+
+    # The source always exists, so the crop is exported to a new file, which
+    # tells whether Inkscape wrote it, and replaces the source then
+    def crop(self, filename, ids):
+        cropped = filename + '.crop.svg'
+        if os.path.exists(cropped):
+            os.remove(cropped)
+        return self.submit(filename, crop_actions(cropped, ids), cropped, filename)
+
+    def convert(self, source, target, text_to_path=False):
+        if os.path.exists(target):
+            os.remove(target)
+        return self.submit(source, convert_actions(target, text_to_path), target)
+
+    def _work(self):
+        worker = None
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            line, future, result, replace = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            for attempt in range(self.retries + 1):
+                try:
+                    if worker is None:
+                        worker = InkscapeWorker(self.command, self.timeout)
+                    answer = worker.run(line)
+                    if os.path.exists(result):
+                        if replace is not None:
+                            os.replace(result, replace)
+                            result = replace
+                        future.set_result(result)
+                    else:
+                        future.set_exception(RuntimeError(
+                            f'Inkscape did not write {result}: {answer.strip()}'))
+                    break
+                except (OSError, RuntimeError, TimeoutError) as error:
+                    # Crashed or hung: the next attempt starts a new Inkscape
+                    if worker is not None:
+                        worker.close()
+                        worker = None
+                    if attempt == self.retries:
+                        future.set_exception(error)
+        if worker is not None:
+            worker.close()
+
+    # Wait for all jobs, raise the first error
+    def wait(self):
+        futures, self.futures = self.futures, []
+        errors = [f.exception() for f in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def close(self):
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
@@ -0,0 +1,229 @@
+import numpy as np
+from .processes import State, States, Data, Parametric, Spline, Iso_t, Adiabatic, Power, Bezier, Parabola
+from .transforms import Mapped
+
+
+# Interactive editing of a drawing: process endpoints and Bezier control
+# points can be dragged with the mouse. Only the processes affected by the
+# drag are re-evaluated and redrawn with blitting. Use it as
+#
+#     d.show(edit=True)
+#
+# When the window is closed, the coordinates are printed as plotnik code.
+class Editor:
+    def __init__(self, drawing, tolerance=10):
+        self.drawing = drawing
+        self.ax = drawing.ax
+        self.canvas = drawing.fig.canvas
+        self.tolerance = tolerance  # Max distance to a handle, in pixels
+        self.active = None          # (process, role) of the dragged handle
+        self.affected = []          # Processes redrawn during the drag
+        self.snapshot = {}          # Points and label positions at press
+        self.background = None
+        self.cids = [
+            self.canvas.mpl_connect('button_press_event', self.on_press),
+            self.canvas.mpl_connect('motion_notify_event', self.on_motion),
+            self.canvas.mpl_connect('button_release_event', self.on_release),
+        ]
+
+    def disconnect(self):
+        for cid in self.cids:
+            self.canvas.mpl_disconnect(cid)
+        self.cids = []
+
+    # All draggable points as (process, role, (x, y))
+    def handles(self):
+        for process in self.drawing.processes:
+            if isinstance(process, (States, Data, Parametric, Spline, Mapped)):
+                continue
+            if process.start is not None:
+                yield process, 'start', process.start
+            if process.end is not None:
+                yield process, 'end', process.end
+            if isinstance(process, Bezier):
+                if process.x1 is not None and process.x2 is not None:
+                    yield process, 'control1', (process.x1, process.y1)
+                    yield process, 'control2', (process.x2, process.y2)
+                else:
+                    yield process, 'control', (process.x, process.y)
+
+    def find_handle(self, event):
+        best, best_distance = None, self.tolerance
+        for process, role, point in self.handles():
+            x, y = self.ax.transData.transform(point)
+            distance = np.hypot(x - event.x, y - event.y)
+            if distance < best_distance:
+                best, best_distance = (process, role), distance
+        return best
+
+    def on_press(self, event):
+        if event.inaxes is not self.ax or event.button != 1:
+            return
+        self.active = self.find_handle(event)
+        if self.active is None:
+            return
+        process, role = self.active
+        self.affected = self._chain(process)
+
+        # Remember positions to move labels together with their points
+        self.snapshot = {}
+        for p in self.affected:
+            labels = {pos: text.get_position() for pos, text in (p.label_artists or {}).items()}
+            self.snapshot[p] = (p.start, p.end, labels)
+
+        # Draw everything except the affected artists once and keep it as a background
+        for artist in self._artists():
+            artist.set_animated(True)
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.drawing.fig.bbox)
+        self._blit()
+
+    def on_motion(self, event):
+        if self.active is None or event.inaxes is not self.ax:
+            return
+        if event.xdata is None or event.ydata is None:
+            return
+        process, role = self.active
+        self._move(process, role, (event.xdata, event.ydata), set())
+        for p in self.affected:
+            self._refresh(p)
+        self.drawing.markers.refresh()
+        self._blit()
+
+    def on_release(self, event):
+        if self.active is None:
+            return
+        for artist in self._artists():
+            artist.set_animated(False)
+        self.active = None
+        self.affected = []
+        self.background = None
+        self.canvas.draw_idle()
+
+    # The process and all processes sharing a point with it, along the chain
+    def _chain(self, process):
+        chain = [process]
+        i = 0
+        while i < len(chain):
+            p = chain[i]
+            for q in self.drawing.processes:
+                if q in chain:
+                    continue
+                if p.end is not None and q.start == p.end or \
+                   p.start is not None and q.end == p.start:
+                    chain.append(q)
+            i += 1
+        return chain
+
+    def _move(self, process, role, point, visited):
+        visited.add(process)
+        old_start, old_end = process.start, process.end
+        x, y = point
+
+        if role == 'control':
+            process.x, process.y = x, y
+        elif role == 'control1':
+            process.x1, process.y1 = x, y
+        elif role == 'control2':
+            process.x2, process.y2 = x, y
+        elif role == 'start':
+            process.start = (x, y)
+            # Previous processes in the chain follow the start point. If one
+            # of them is an isotherm or adiabat, the point snaps to its curve.
+            for q in self._linked(old_start, 'end', visited):
+                self._move(q, 'end', process.start, visited)
+                process.start = q.end
+            # Isotherm and adiabat keep their end volume and stay on the curve
+            if isinstance(process, (Iso_t, Adiabatic)) and old_end is not None:
+                process.to(old_end[0], 'volume')
+        elif role == 'end':
+            if isinstance(process, (Iso_t, Adiabatic)):
+                process.to(x, 'volume')
+            else:
+                process.end = (x, y)
+
+        # Next processes in the chain (shared last_point) follow the end point
+        if old_end is not None and process.end != old_end:
+            for q in self._linked(old_end, 'start', visited):
+                self._move(q, 'start', process.end, visited)
+
+    def _linked(self, point, attr, visited):
+        if point is None:
+            return []
+        return [q for q in self.affected
+                if q not in visited and getattr(q, attr) == point]
+
+    def _refresh(self, process):
+        if process.line is not None:
+            process._evaluate()
+            process.line.set_data(process.x_values, process.y_values)
+            if process.arrow_patch is not None:
+                x, y, dx, dy = process._arrow_position(process.x_values, process.y_values)
+                process.arrow_positions = ((x, y), (x + dx, y + dy))
+                process.arrow_patch.set_positions(*process.arrow_positions)
+
+        points = {'start': process.start, 'end': process.end}
+        old_start, old_end, labels = self.snapshot[process]
+        old_points = {'start': old_start, 'end': old_end}
+        for pos, text in (process.label_artists or {}).items():
+            tx, ty = labels[pos]
+            text.set_position((tx + points[pos][0] - old_points[pos][0],
+                               ty + points[pos][1] - old_points[pos][1]))
+
+    def _artists(self):
+        for p in self.affected:
+            if p.line is not None:
+                yield p.line
+            if p.arrow_patch is not None:
+                yield p.arrow_patch
+            yield from (p.label_artists or {}).values()
+        yield from self.drawing.markers.artists()
+
+    def _blit(self):
+        self.canvas.restore_region(self.background)
+        for artist in self._artists():
+            self.ax.draw_artist(artist)
+        self.canvas.blit(self.drawing.fig.bbox)
+
+    # Current geometry of the drawing as plotnik code
+    def code(self):
+        lines = []
+        previous = None
+        for process in self.drawing.processes:
+            chained = previous is not None and process.start == previous.end
+            lines.append(process_code(process, chained))
+            previous = process
+        return '\n'.join(lines)
+
+
+def _fmt(value):
+    return f'{float(value):.4g}'
+
+
+def process_code(process, chained=False):
+    if isinstance(process, State):
+        return f'State().at({_fmt(process.start[0])}, {_fmt(process.start[1])})'
+
+    if isinstance(process, Bezier):
+        if process.x1 is not None and process.x2 is not None:
+            head = (f'Bezier(x1={_fmt(process.x1)}, y1={_fmt(process.y1)}, '
+                    f'x2={_fmt(process.x2)}, y2={_fmt(process.y2)})')
+        else:
+            head = f'Bezier(x={_fmt(process.x)}, y={_fmt(process.y)})'
+    elif isinstance(process, Adiabatic):
+        head = f'Adiabatic(gamma={_fmt(process.gamma)})'
+    elif isinstance(process, Power):
+        head = f'Power({_fmt(process.power)})'
+    elif isinstance(process, Parabola):
+        head = f'Parabola().vertex({_fmt(process.vertex_x)}, {_fmt(process.vertex_y)})'
+    else:
+        head = f'{type(process).__name__}()'
+
+    code = head
+    if not chained:
+        code += f'.at({_fmt(process.start[0])}, {_fmt(process.start[1])})'
+    if isinstance(process, (Iso_t, Adiabatic)):
+        code += f".to({_fmt(process.end[0])}, 'volume')"
+    elif process.end is not None:
+        code += f'.to({_fmt(process.end[0])}, {_fmt(process.end[1])})'
+    return code
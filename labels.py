@@ -0,0 +1,147 @@
+from collections import defaultdict
+import numpy as np
+from matplotlib import rcParams
+from .geometry import GeometryCache
+
+
+# Sizes of label texts in pixels, measured once per string and font. Bounded
+# like the geometry cache, as servers and watch loops see endless new texts.
+TEXT_EXTENTS = GeometryCache(size=1024)
+
+
+def text_extent(text, renderer):
+    key = (text.get_text(), text.get_fontsize(), text.get_usetex(),
+           rcParams['mathtext.fontset'], tuple(rcParams['font.family']),
+           renderer.dpi)
+    extent = TEXT_EXTENTS.get(key)
+    if extent is None:
+        bbox = text.get_window_extent(renderer)
+        extent = TEXT_EXTENTS.put(key, (bbox.width, bbox.height))
+    return extent
+
+
+# Uniform grid over the figure (in pixels). Stores obstacle points (curve
+# samples, dots, axes) and rectangles (placed labels, arrows), so a query
+# only looks at the few cells covered by a candidate label.
+class GridIndex:
+    def __init__(self, cell):
+        self.cell = cell
+        self.points = defaultdict(list)
+        self.rects = defaultdict(list)
+
+    def _cells(self, rect):
+        x0, y0, x1, y1 = rect
+        for i in range(int(np.floor(x0 / self.cell)), int(np.floor(x1 / self.cell)) + 1):
+            for j in range(int(np.floor(y0 / self.cell)), int(np.floor(y1 / self.cell)) + 1):
+                yield i, j
+
+    def add_points(self, xy):
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        cells = np.floor(xy / self.cell).astype(int)
+        for (i, j), (x, y) in zip(cells.tolist(), xy.tolist()):
+            self.points[i, j].append((x, y))
+
+    def add_rect(self, rect):
+        for cell in self._cells(rect):
+            self.rects[cell].append(rect)
+
+    # Number of obstacle points inside the rectangle plus the overlap with
+    # stored rectangles (in units of the rectangle area)
+    def cost(self, rect):
+        x0, y0, x1, y1 = rect
+        area = max((x1 - x0) * (y1 - y0), 1)
+        points = 0
+        overlap = 0
+        seen = set()
+        for cell in self._cells(rect):
+            for x, y in self.points.get(cell, ()):
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    points += 1
+            for other in self.rects.get(cell, ()):
+                if id(other) in seen:
+                    continue
+                seen.add(id(other))
+                w = min(x1, other[2]) - max(x0, other[0])
+                h = min(y1, other[3]) - max(y0, other[1])
+                if w > 0 and h > 0:
+                    overlap += w * h / area
+        return points + 10 * overlap
+
+
+# Points along a polyline (in pixels) not farther than `step` apart
+def densify(xy, step):
+    xy = xy[np.isfinite(xy).all(axis=1)]
+    if len(xy) < 2:
+        return xy
+    length = np.insert(np.cumsum(np.hypot(*np.diff(xy, axis=0).T)), 0, 0)
+    distance = np.linspace(0, length[-1], max(int(length[-1] / step), 1) + 1)
+    return np.column_stack([np.interp(distance, length, xy[:, 0]),
+                            np.interp(distance, length, xy[:, 1])])
+
+
+# Offsets tried around a point, in the order of preference. The default
+# offset from calculate_ofst() goes first.
+def candidate_offsets(dx, dy):
+    ax, ay = abs(dx), abs(dy)
+    candidates = [(dx, dy)]
+    for k in (1, 1.6):
+        candidates += [(sx * ax * k, sy * ay * k)
+                       for sx, sy in ((1, 1), (-1, 1), (1, -1), (-1, -1))]
+        candidates += [(0, ay * 1.1 * k), (0, -ay * 1.1 * k),
+                       (ax * 1.2 * k, 0), (-ax * 1.2 * k, 0)]
+    return candidates
+
+
+# Place labels without explicit offsets so that they do not overlap
+# curves, dots, arrows, axes and each other. Labels with offsets set by the
+# user stay where they are and only act as obstacles.
+def place_labels(drawing, labels, padding=2):
+    ax = drawing.ax
+    renderer = drawing.fig.canvas.get_renderer()
+    ax.apply_aspect()
+    trans = ax.transData
+
+    measured = [(process, point, text, text_extent(text, renderer))
+                for process, point, text in labels]
+    if not measured:
+        return
+    cell = max(max(w, h) for _, _, _, (w, h) in measured)
+    index = GridIndex(max(cell, 1))
+
+    # Obstacles: lines (curves, tox/toy, grid), dots, arrows, axes and all
+    # other texts
+    for line in ax.lines:
+        if line.get_visible() and line.get_linestyle() not in ('None', ' ', ''):
+            index.add_points(densify(trans.transform(line.get_xydata()), index.cell / 3))
+    for process in drawing.processes:
+        if process.arrow_patch is not None:
+            bbox = process.arrow_patch.get_window_extent(renderer)
+            index.add_rect((bbox.x0, bbox.y0, bbox.x1, bbox.y1))
+    for collection in drawing.markers.artists():
+        index.add_points(trans.transform(collection.get_offsets()))
+    xlim, ylim = ax.get_xlim(), ax.get_ylim()
+    axis = np.linspace(0, 1, 200)
+    index.add_points(trans.transform(np.column_stack([xlim[0] + axis * (xlim[1] - xlim[0]), 0 * axis])))
+    index.add_points(trans.transform(np.column_stack([0 * axis, ylim[0] + axis * (ylim[1] - ylim[0])])))
+    auto_texts = {id(text) for _, _, text, _ in measured}
+    for text in ax.texts:
+        if id(text) not in auto_texts and text.get_text():
+            bbox = text.get_window_extent(renderer)
+            index.add_rect((bbox.x0, bbox.y0, bbox.x1, bbox.y1))
+
+    figure = drawing.fig.bbox
+    for process, point, text, (w, h) in measured:
+        best, best_cost = None, None
+        for i, (dx, dy) in enumerate(candidate_offsets(*process.calculate_ofst(point))):
+            x, y = trans.transform((point[0] + dx, point[1] + dy))
+            rect = (x - w / 2 - padding, y - h / 2 - padding,
+                    x + w / 2 + padding, y + h / 2 + padding)
+            cost = index.cost(rect) + 0.01 * i
+            if rect[0] < figure.x0 or rect[1] < figure.y0 or \
+               rect[2] > figure.x1 or rect[3] > figure.y1:
+                cost += 100
+            if best_cost is None or cost < best_cost:
+                best, best_cost = (dx, dy, rect), cost
+        dx, dy, rect = best
+        text.set_position((point[0] + dx, point[1] + dy))
+        index.add_rect(rect)
@@ -0,0 +1,59 @@
+import numpy as np
+from matplotlib import rcParams
+from matplotlib.colors import to_rgba
+
+
+# Dots of all processes of a drawing. Markers are grouped by style
+# (marker, size, color, zorder); every group is drawn as a single scatter
+# (PathCollection). Coincident points of one style, e.g. the shared vertex of
+# two processes with .dot('both'), are drawn once.
+class Markers:
+    def __init__(self, decimals=9):
+        self.decimals = decimals  # Points equal after rounding are merged
+        self.groups = {}          # style -> list of (process, key)
+        self.collections = {}     # style -> (PathCollection, inverse index)
+
+    # key is 'start' or 'end' for a point of a process, or None for all
+    # points of a vectorized process (States)
+    def add(self, process, key, marker='o', size=6, color='k', zorder=5):
+        style = (marker, size, to_rgba(color), float(zorder))
+        self.groups.setdefault(style, []).append((process, key))
+
+    def add_process(self, process):
+        for key, params in process._dots():
+            self.add(process, key, **params)
+
+    def _points(self, style):
+        points = []
+        for process, key in self.groups[style]:
+            if key is None:
+                points.append(np.column_stack([process.xs, process.ys]))
+            else:
+                points.append(np.array([getattr(process, key)], dtype=float))
+        return np.concatenate(points)
+
+    def draw(self, ax):
+        for collection, _ in self.collections.values():
+            collection.remove()
+        self.collections = {}
+
+        for i, (style, owners) in enumerate(self.groups.items(), 1):
+            marker, size, color, zorder = style
+            points = self._points(style)
+            _, index, inverse = np.unique(np.round(points, self.decimals), axis=0,
+                                          return_index=True, return_inverse=True)
+            collection = ax.scatter(points[index, 0], points[index, 1],
+                                    s=size ** 2, marker=marker, color=color,
+                                    linewidths=rcParams['lines.markeredgewidth'],
+                                    zorder=zorder, gid=f'dots-{i}')
+            self.collections[style] = (collection, inverse.ravel())
+
+    # Move drawn markers to the current points of their processes
+    def refresh(self):
+        for style, (collection, inverse) in self.collections.items():
+            offsets = np.asarray(collection.get_offsets()).copy()
+            offsets[inverse] = self._points(style)
+            collection.set_offsets(offsets)
+
+    def artists(self):
+        return [collection for collection, _ in self.collections.values()]
@@ -0,0 +1,113 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from matplotlib.collections import Collection
+from matplotlib.lines import Line2D
+from matplotlib.patches import FancyArrowPatch, Patch
+from matplotlib.text import Text
+
+# Previews of drawings in Jupyter (Drawing._repr_svg_, _repr_png_).
+#
+# With set_config(preview='draft') (default) a drawing is shown as a PNG at
+# 'preview_dpi', curves with fewer samples and texts with mathtext instead
+# of LaTeX. With preview='final' it is shown as SVG, as saved.
+#
+# Previews are cached by a hash of the drawn state (config and all artists),
+# so displaying an unchanged drawing again does not render it.
+
+PREVIEW_CACHE = OrderedDict()
+PREVIEW_CACHE_SIZE = 32
+
+
+def _artist_state(artist):
+    if isinstance(artist, Line2D):
+        return (np.asarray(artist.get_xydata(), dtype=float).tobytes(),
+                artist.get_color(), artist.get_linewidth(), artist.get_linestyle(),
+                artist.get_marker(), artist.get_markersize(), artist.get_zorder())
+    if isinstance(artist, Text):
+        return (artist.get_text(), artist.get_position(), artist.get_fontsize(),
+                artist.get_color(), artist.get_ha(), artist.get_va(),
+                artist.get_rotation(), artist.get_usetex())
+    if isinstance(artist, Collection):
+        return (np.asarray(artist.get_offsets(), dtype=float).tobytes(),
+                artist.get_facecolors().tobytes(), artist.get_sizes().tobytes())
+    if isinstance(artist, FancyArrowPatch):
+        # The path depends on the dpi of the last render; the end points of
+        # process arrows are hashed with their processes, axes arrows follow
+        # the config
+        return (artist.get_mutation_scale(), tuple(artist.get_facecolor()),
+                artist.get_linewidth())
+    if isinstance(artist, Patch):
+        return (tuple(artist.get_facecolor()), tuple(artist.get_edgecolor()),
+                artist.get_linewidth())
+    return ()
+
+
+# Hash of everything that affects the picture
+def state_hash(drawing, *extra):
+    h = hashlib.sha256(repr((extra, sorted(drawing.config.items(), key=str))).encode())
+    for ax in drawing.fig.axes:
+        h.update(repr((ax.get_xlim(), ax.get_ylim(), ax.get_position().bounds)).encode())
+        for axis in (ax.xaxis, ax.yaxis):
+            h.update(np.asarray(axis.get_ticklocs(), dtype=float).tobytes())
+            h.update(repr([label.get_text() for label in axis.get_ticklabels()]).encode())
+        for artist in ax.get_children():
+            if artist.get_visible():
+                h.update(repr((type(artist).__name__, artist.get_gid(),
+                               _artist_state(artist))).encode())
+    for cell in drawing._drawings():
+        for process in cell.processes:
+            h.update(repr((process.type, process.start, process.end,
+                           process.arrow_params, process.arrow_positions)).encode())
+    return h.hexdigest()
+
+
+def _draft_png(drawing):
+    dpi = drawing.config['preview_dpi']
+    texts = [text for text in drawing.fig.findobj(Text) if text.get_usetex()]
+    lines = []
+    for cell in drawing._drawings():
+        for process in cell.processes:
+            if process.line is None or process.start is None or process.end is None:
+                continue
+            x, y = process._sample(resolution=dpi)
+            if x is not None:
+                lines.append((process.line, process.line.get_xydata()))
+                process.line.set_data(x, y)
+    for text in texts:
+        text.set_usetex(False)
+    try:
+        try:
+            return drawing.to_bytes('png', dpi=dpi)
+        except ValueError:
+            # A text mathtext cannot parse: keep LaTeX for it
+            for text in texts:
+                text.set_usetex(True)
+            return drawing.to_bytes('png', dpi=dpi)
+    finally:
+        for text in texts:
+            text.set_usetex(True)
+        for line, xy in lines:
+            line.set_data(xy[:, 0], xy[:, 1])
+
+
+# Preview in the given format ('svg' or 'png'), or None if the drawing is
+# not shown in this format in the current preview mode
+def preview(drawing, format):
+    mode = drawing.config['preview']
+    if (mode == 'draft') != (format == 'png'):
+        return None
+    if not drawing.rendered:
+        drawing._render()
+
+    key = state_hash(drawing, format, mode)
+    if key in PREVIEW_CACHE:
+        PREVIEW_CACHE.move_to_end(key)
+        return PREVIEW_CACHE[key]
+
+    with drawing._phase('preview', mode=mode):
+        data = _draft_png(drawing) if mode == 'draft' else drawing.to_bytes(format)
+    PREVIEW_CACHE[key] = data
+    if len(PREVIEW_CACHE) > PREVIEW_CACHE_SIZE:
+        PREVIEW_CACHE.popitem(last=False)
+    return data
@@ -1,24 +1,82 @@
+from itertools import islice
+import os
+from matplotlib import rcParams
 from matplotlib.patches import FancyArrowPatch, ArrowStyle
 import numpy as np
-from scipy.interpolate import interp1d
+from scipy.interpolate import interp1d, PchipInterpolator
+from scipy.linalg import solve_banded
+from .geometry import GEOMETRY_CACHE
 from .global_drawing import GLOBAL_DRAWING
 
+# Samples per curve unless 'resolution' or 'tolerance' is set in the config
+NUM_SAMPLES = 100
+MAX_SAMPLES = 4000
+# Samples used to estimate length and bending of a curve
+PILOT_SAMPLES = 33
+# Ideal gas with U = pV / (gamma - 1): monatomic unless gamma is given
+GAMMA = 5/3
+# Samples for work and heat of processes without a closed form
+INTEGRAL_SAMPLES = 10001
+# Spline(): samples per piece between two points at least
+SPLINE_PIECE_SAMPLES = 8
+# Data(): dpi of decimation without 'resolution' or 'tolerance', points read
+# at once, file extensions read as text
+DATA_DPI = 300
+DATA_CHUNK = 200_000
+PILOT_BLOCKS = 1024
+# Function(), Parametric(): refinement rounds and samples at most, and the
+# share of a chord in one half that marks a pole or a jump
+MAX_DEPTH = 16
+MAX_ADAPTIVE_SAMPLES = 40000
+# Function(), Parametric() lines end this share of the limits beyond them
+CLIP_MARGIN = 0.05
+JUMP_RATIO = 0.9
+TEXT_EXTENSIONS = ('.csv', '.txt', '.tsv')
+
 
 # Process() is a parent class for
 # Linear(), Power(), Iso_t(), Adiabatic(), Bezier() subclasses.
+#
+# Attributes are declared in __slots__, so a process has no per-instance
+# __dict__. Optional parts (arrow, dots, extra lines, labels, ticks) stay None
+# until they are set.
 class Process:
+    __slots__ = ('start', 'end', 'type', 'color', 'linestyle', 'zorder',
+                 'linewidth', 'config', 'arrow_params', 'dots_params',
+                 'extra_lines', 'x_values', 'y_values',
+                 'start_label', 'end_label',
+                 'start_xtick_label', 'end_xtick_label',
+                 'start_ytick_label', 'end_ytick_label',
+                 'line', 'arrow_patch', 'arrow_positions', 'label_artists')
+    # Attributes that define the curve besides the end points, for the
+    # geometry cache (None: not cached)
+    _key_attributes = None
+
     def __init__(self):
         self.start = None
         self.end = None
+        self.type = None
         self.color = 'k'
-        self.arrow_params = {}
-        self.dots_params = {'start': None, 'end': None}
         self.linestyle = '-'
         self.zorder = 1
         self.linewidth = 2.5
-        self.extra_lines = [] # to store tox(), toy(), tozero() information
-        self.xtick_labels = []
-        self.ytick_labels = []
+        self.config = None          # Set by the Drawing
+        self.arrow_params = None    # Set by arrow()
+        self.dots_params = None     # Set by dot(): {'start': ..., 'end': ...}
+        self.extra_lines = None     # tox(), toy(), tozero() information
+        self.x_values = None        # Samples of the curve, set by _evaluate()
+        self.y_values = None
+        self.start_label = None
+        self.end_label = None
+        self.start_xtick_label = None
+        self.end_xtick_label = None
+        self.start_ytick_label = None
+        self.end_ytick_label = None
+        # Artists created by plot(), kept to update them in interactive mode
+        self.line = None
+        self.arrow_patch = None
+        self.arrow_positions = None # Tail and head of arrow_patch
+        self.label_artists = None
         self._add_to_global_drawing()
 
     def _add_to_global_drawing(self):
@@ -57,27 +115,45 @@ class Process:
             self.arrow_params['size'] = size
         return self
 
-    def _add_arrow(self, ax, x_values, y_values):
+    # Position (x, y) and direction (dx, dy) of the arrow on the curve,
+    # cached with the samples
+    def _arrow_position(self, x_values, y_values):
+        key = None
+        if x_values is self.x_values:
+            key = self._geometry_key()
+            if key is not None:
+                key += ('arrow', self.arrow_params['pos'], self.arrow_params['reverse'])
+        position = GEOMETRY_CACHE.get(key)
+        if position is None:
+            position = GEOMETRY_CACHE.put(key, self._find_arrow_position(x_values, y_values))
+        return position
+
+    def _find_arrow_position(self, x_values, y_values):
         x_values, y_values = interpolate_curve(x_values, y_values)
+        index = int(len(x_values) * self.arrow_params['pos'])
+        x, y = x_values[index], y_values[index]
+
+        # Calculate arrow rotation
+        if index < len(x_values) - 1:
+            dx = x_values[index + 1] - x
+            dy = y_values[index + 1] - y
+        else:
+            dx = x - x_values[index - 1]
+            dy = y - y_values[index - 1]
+
+        # Reverse the arrow
+        if self.arrow_params['reverse']:
+            dx, dy = -dx, -dy
+
+        return x, y, dx, dy
+
+    def _add_arrow(self, ax, x_values, y_values):
         if self.arrow_params:
-            index = int(len(x_values) * self.arrow_params['pos'])
-            x, y = x_values[index], y_values[index]
+            x, y, dx, dy = self._arrow_position(x_values, y_values)
             arrow_size = self.arrow_params.get('size')
             if arrow_size is None:
                 arrow_size = self.config.get('arrow_size', 27)
 
-            # Calculate arrow rotation
-            if index < len(x_values) - 1:
-                dx = x_values[index + 1] - x
-                dy = y_values[index + 1] - y
-            else:
-                dx = x - x_values[index - 1]
-                dy = y - y_values[index - 1]
-
-            # Reverse the arrow
-            if self.arrow_params['reverse']:
-                dx, dy = -dx, -dy
-
             # Arrow style
             if self.arrow_params['filled']:
                 style = ArrowStyle('-|>', head_length=self.arrow_params['head_length'],
@@ -87,14 +163,15 @@ class Process:
                                    head_width=self.arrow_params['head_width'])
 
             # Draw arrow
+            self.arrow_positions = ((x, y), (x + dx, y + dy))
             arrow = FancyArrowPatch(
-                (x, y), (x + dx, y + dy),
+                *self.arrow_positions,
                 arrowstyle=style,
                 color=self.arrow_params['color'],
                 mutation_scale=arrow_size,
                 zorder=self.arrow_params['zorder']
             )
-            ax.add_patch(arrow)
+            self.arrow_patch = ax.add_patch(arrow)
 
     def col(self, color):
         self.color = color
@@ -118,28 +195,36 @@ class Process:
         dot_params = {**default_params, **kwargs}
 
         if pos in ['start', 'end', 'both']:
+            if self.dots_params is None:
+                self.dots_params = {'start': None, 'end': None}
             if pos == 'both':
                 self.dots_params['start'] = self.dots_params['end'] = dot_params
             else:
                 self.dots_params[pos] = dot_params
         return self
 
-    def _add_dots(self, ax):
+    # Dots as (position, params). They are drawn by the Drawing, all dots of
+    # one style in a single scatter, see markers.py
+    def _dots(self):
+        dots = []
+        if self.dots_params is None:
+            return dots
         for position in ['start', 'end']:
             if self.dots_params[position]:
                 point = self.start if position == 'start' else self.end
                 # Check that point has 2 coordinates
                 if point and None not in point:
-                    ax.plot(point[0], point[1],
-                            marker=self.dots_params[position].get('marker', 'o'),
-                            markersize=self.dots_params[position].get('size', 6),
-                            color=self.dots_params[position].get('color', 'k'),
-                            zorder=self.dots_params[position].get('zorder', '5'),
-                            )
+                    dots.append((position, {
+                        'marker': self.dots_params[position].get('marker', 'o'),
+                        'size': self.dots_params[position].get('size', 6),
+                        'color': self.dots_params[position].get('color', 'k'),
+                        'zorder': self.dots_params[position].get('zorder', 5),
+                    }))
+        return dots
 
     def calculate_ofst(self, point=None):
         # Check that config is accessible
-        if not hasattr(self, 'config') or not self.config:
+        if not self.config:
             raise ValueError("Config not set for this process.")
 
         xlen = self.config['xlim'][1] - self.config['xlim'][0]
@@ -191,7 +276,7 @@ class Process:
 
 
     def _add_labels(self, ax, config):
-        def add_label(point, label_data, ax, config):
+        def add_label(point, label_data, ax, config, position):
             if label_data['ofst'] is None:
                 dx, dy = self.calculate_ofst(point)
             else:
@@ -202,43 +287,55 @@ class Process:
                     dx = dx if dx is not None else default_dx
                     dy = dy if dy is not None else default_dy
 
-            ax.text(point[0] + dx, point[1] + dy, label_data['text'],
+            if self.label_artists is None:
+                self.label_artists = {}
+            self.label_artists[position] = ax.text(
+                    point[0] + dx, point[1] + dy, label_data['text'],
                     fontsize=config['fontsize'], ha='center', va='center')
 
 
-        if hasattr(self, 'start_label') and self.start:
-            add_label(self.start, self.start_label, ax, config)
+        if self.start_label is not None and self.start:
+            add_label(self.start, self.start_label, ax, config, 'start')
 
-        if hasattr(self, 'end_label') and self.end:
-            add_label(self.end, self.end_label, ax, config)
+        if self.end_label is not None and self.end:
+            add_label(self.end, self.end_label, ax, config, 'end')
 
 
     # For Bezier().connect() to work
+    # Tangents are taken over one step of the default sampling, so they do
+    # not depend on the sample count
     def tangent_at_end(self):
-        if hasattr(self, 'x_values') and hasattr(self, 'y_values') and len(self.x_values) > 1:
-            # Use the last two points to determine the tangent
-            direction = (self.x_values[-1] - self.x_values[-2], self.y_values[-1] - self.y_values[-2])
-            return direction
-        return None
+        if self.start is None or self.end is None:
+            return None
+        x, y = self._curve(np.array([1 - 1 / (NUM_SAMPLES - 1), 1]))
+        if x is None:
+            return None
+        return (x[1] - x[0], y[1] - y[0])
 
     def tangent_at_start(self):
-        if hasattr(self, 'x_values') and hasattr(self, 'y_values') and len(self.x_values) > 1:
-            # Use the first two points to determine the tangent
-            direction = (self.x_values[1] - self.x_values[0], self.y_values[1] - self.y_values[0])
-            return direction
-        return None
-        
+        if self.start is None or self.end is None:
+            return None
+        x, y = self._curve(np.array([0, 1 / (NUM_SAMPLES - 1)]))
+        if x is None:
+            return None
+        return (x[1] - x[0], y[1] - y[0])
+
+
+    def _add_extra_line(self, line):
+        if self.extra_lines is None:
+            self.extra_lines = []
+        self.extra_lines.append(line)
 
     def tox(self, type='both', color='k', ls='--', lw=1.6):
-        self.extra_lines.append(('x', type, color, ls, lw))
+        self._add_extra_line(('x', type, color, ls, lw))
         return self
 
     def toy(self, type='both', color='k', ls='--', lw=1.6):
-        self.extra_lines.append(('y', type, color, ls, lw))
+        self._add_extra_line(('y', type, color, ls, lw))
         return self
 
     def tozero(self, type='both', color='k', ls='--', lw=1.6):
-        self.extra_lines.append(('zero', type, color, ls, lw))
+        self._add_extra_line(('zero', type, color, ls, lw))
         return self
 
     def xtick(self, *labels, which=None):
@@ -291,18 +388,154 @@ class Process:
 
         return self
 
+    # Subclasses return points (x, y) of the curve at parameters t in [0, 1]
+    def _curve(self, t):
+        return None, None
+
+    # Points (x, y) of the curve for drawing at the given dpi (the config by
+    # default)
+    def _sample(self, resolution=None):
+        return self._curve(np.linspace(0, 1, self._num_samples(resolution)))
+
+    def _evaluate(self):
+        key = self._geometry_key()
+        samples = GEOMETRY_CACHE.get(key)
+        if samples is None:
+            samples = self._sample()
+            if key is not None:
+                for values in samples:
+                    values.setflags(write=False)
+            GEOMETRY_CACHE.put(key, samples)
+        self.x_values, self.y_values = samples
+
+    # Key of the samples in GEOMETRY_CACHE: type, the attributes named in
+    # _key_attributes, end points and sampling settings. None if the curve
+    # is not cached (_key_attributes is None, or arrays of parameters).
+    def _geometry_key(self):
+        if self._key_attributes is None or self.start is None or self.end is None:
+            return None
+        config = self.config or {}
+        sampling = None
+        if config.get('resolution') is not None or config.get('tolerance') is not None:
+            sampling = (config.get('resolution'), config.get('tolerance'), data_scale(config))
+        key = (type(self).__name__, tuple(self.start), tuple(self.end),
+               tuple(getattr(self, name) for name in self._key_attributes), sampling)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    # Number of samples for the curve. With 'resolution' (dpi of raster
+    # output) or 'tolerance' (in points, for vector output) in the config, the
+    # polyline deviates from the curve by at most half a pixel or the
+    # tolerance on the figure: small figures get fewer samples, large figures
+    # and strongly bent curves get more.
+    def _num_samples(self, resolution=None):
+        config = self.config or {}
+        tolerance = None
+        if resolution is None:
+            resolution = config.get('resolution')
+            tolerance = config.get('tolerance')
+        if resolution is None and tolerance is None:
+            return NUM_SAMPLES
+        # Allowed deviation in inches
+        eps = tolerance / 72 if tolerance is not None else 0.5 / resolution
+
+        x, y = self._curve(np.linspace(0, 1, PILOT_SAMPLES))
+        if x is None:
+            return NUM_SAMPLES
+        sx, sy = data_scale(config)
+        dx, dy = np.diff(x) * sx, np.diff(y) * sy
+        length = np.hypot(dx, dy)
+        turn = np.abs(np.diff(np.unwrap(np.arctan2(dy, dx))))
+        # A chord of length l turning by angle b deviates from the curve by
+        # about l*b/8, so each pilot step needs sqrt(l*b / (8 eps)) chords.
+        # Steps are uniform in t, the most bent step sets the count.
+        need = np.sqrt(np.maximum(length[1:], length[:-1]) * turn / (8 * eps))
+        if not np.all(np.isfinite(need)):
+            return MAX_SAMPLES
+        n = int(np.ceil(need.max(initial=0) * (PILOT_SAMPLES - 1)))
+        return min(max(n + 1, 2), MAX_SAMPLES)
+
+    # Samples may have been released by compact('drop'), recalculate them
+    def _ensure_samples(self):
+        if self.x_values is None and self.start is not None and self.end is not None:
+            self._evaluate()
+
+    # Release memory of the samples once the curve is drawn: 'float32' keeps
+    # them in single precision, 'drop' removes them (they are recalculated
+    # when needed, e.g. for Bezier().connect()).
+    def compact(self, mode='float32'):
+        if self.x_values is None:
+            return self
+        if mode == 'drop':
+            self.x_values = self.y_values = None
+        elif mode == 'float32':
+            self.x_values = np.asarray(self.x_values, dtype=np.float32)
+            self.y_values = np.asarray(self.y_values, dtype=np.float32)
+        else:
+            raise ValueError(f"Unknown compact mode '{mode}'")
+        return self
+
+    # Work done by the gas from start to end (area under the curve in p(V)
+    # coordinates), change of internal energy and heat of an ideal gas. The
+    # numbers of start and end may be NumPy arrays to compute many variants
+    # at once. Subclasses give closed forms; others are integrated over
+    # INTEGRAL_SAMPLES samples.
+    def work(self):
+        V, p = self._integral_samples()
+        return np.sum((p[1:] + p[:-1]) / 2 * np.diff(V, axis=0), axis=0)
+
+    def delta_u(self, gamma=None):
+        gamma = self._gamma(gamma)
+        V1, p1 = self._end_arrays('start')
+        V2, p2 = self._end_arrays('end')
+        return (p2 * V2 - p1 * V1) / (gamma - 1)
+
+    def heat(self, gamma=None):
+        return self.delta_u(gamma) + self.work()
+
+    # Heat received: parts of the process where heat flows out do not count
+    # (needed for the efficiency of a cycle)
+    def heat_in(self, gamma=None):
+        gamma = self._gamma(gamma)
+        V, p = self._integral_samples()
+        dq = np.diff(p * V, axis=0) / (gamma - 1) + (p[1:] + p[:-1]) / 2 * np.diff(V, axis=0)
+        return np.sum(np.maximum(dq, 0), axis=0)
+
+    def _gamma(self, gamma):
+        return GAMMA if gamma is None else gamma
+
+    def _end_arrays(self, which):
+        point = self.start if which == 'start' else self.end
+        if point is None:
+            raise ValueError(f"The {which} point of '{self.type}' process is not set.")
+        return np.asarray(point[0], dtype=float), np.asarray(point[1], dtype=float)
+
+    def _integral_samples(self):
+        V1, p1 = self._end_arrays('start')
+        V2, p2 = self._end_arrays('end')
+        shape = np.broadcast(V1, p1, V2, p2).shape
+        t = np.linspace(0, 1, INTEGRAL_SAMPLES).reshape((-1,) + (1,) * len(shape))
+        V, p = self._curve(t)
+        if V is None:
+            raise ValueError(f"Work of '{self.type}' process is not defined.")
+        return V, p
+
     def plot(self, ax, config):
-        if hasattr(self, 'x_values') and hasattr(self, 'y_values'):
-            ax.plot(self.x_values, self.y_values, color=self.color,
-                    linestyle=self.linestyle, linewidth=self.linewidth,
-                    zorder=self.zorder)
+        if self.x_values is not None and self.y_values is not None:
+            self.line, = ax.plot(self.x_values, self.y_values, color=self.color,
+                                 linestyle=self.linestyle, linewidth=self.linewidth,
+                                 zorder=self.zorder)
             if self.arrow_params:
                 self._add_arrow(ax, self.x_values, self.y_values)
-            self._add_dots(ax)
         # Add labels
         self._add_labels(ax, config)
 
 class State(Process):
+    __slots__ = ('draw_dot', 'dot_params', 'label_text', 'label_ofst', 'ax')
+
     def __init__(self, drawing=None):
         super().__init__()  # Call the constructor of the parent class
         self.draw_dot = False  # Flag to control the drawing of the point
@@ -326,38 +559,132 @@ class State(Process):
         self.draw_dot = True
         return self
 
+    def _dots(self):
+        if self.draw_dot:
+            # zorder of a point drawn with ax.plot()
+            return [('start', {**self.dot_params, 'marker': 'o', 'zorder': 2})]
+        return []
+
     def plot(self, ax, config):
         if self.start is None:
             raise ValueError("Start point not set for State.")
 
-        x, y = self.start
-
-        # Drawing the point
-        if self.draw_dot:
-            ax.plot(x, y, 'o', markersize=self.dot_params['size'], color=self.dot_params['color'])
-
         ## If a label is provided, draw it
         self._add_labels(ax, config)
             
         return self
 
+# Many state points at once, e.g. States(xs, ys, labels=['1', '2', '3']).
+# All dots are drawn in one scatter together with other dots of this style.
+class States(Process):
+    __slots__ = ('xs', 'ys', 'labels', 'label_ofst', 'draw_dot', 'dot_params')
+
+    def __init__(self, xs, ys, labels=None, ofst=None):
+        super().__init__()
+        self.type = 'states'
+        self.xs = np.asarray(xs, dtype=float).ravel()
+        self.ys = np.asarray(ys, dtype=float).ravel()
+        if self.xs.shape != self.ys.shape:
+            raise ValueError("xs and ys must have the same length.")
+        # States are not chained: start is the first point, no end point
+        self.start = (self.xs[0], self.ys[0]) if len(self.xs) else None
+        self.end = None
+        self.draw_dot = True
+        self.dot_params = {'size': 6, 'color': 'black', 'marker': 'o', 'zorder': 2}
+        self.labels = labels
+        self.label_ofst = ofst
+
+    def dot(self, size=6, color='k', marker='o', zorder=2):
+        self.dot_params = {'size': size, 'color': color, 'marker': marker, 'zorder': zorder}
+        self.draw_dot = True
+        return self
+
+    def nodot(self):
+        self.draw_dot = False
+        return self
+
+    def label(self, labels, ofst=None):
+        self.labels = labels
+        self.label_ofst = ofst
+        return self
+
+    def _dots(self):
+        if self.draw_dot and len(self.xs):
+            return [(None, self.dot_params)]
+        return []
+
+    def plot(self, ax, config):
+        if self.labels is None:
+            return self
+        for x, y, text in zip(self.xs, self.ys, self.labels):
+            if text is None or text == '':
+                continue
+            dx, dy = self.label_ofst if self.label_ofst is not None \
+                else self.calculate_ofst((x, y))
+            ax.text(x + dx, y + dy, text, fontsize=config['fontsize'],
+                    ha='center', va='center')
+        return self
+
 class Linear(Process):
+    __slots__ = ()
+    _key_attributes = ()
+
     def __init__(self):
         super().__init__()
         self.type = 'linear'
+
+    def _curve(self, t):
+        V1, p1 = self.start
+        V2, p2 = self.end
+        return V1 + (V2 - V1) * t, p1 + (p2 - p1) * t
+
+    def work(self):
+        V1, p1 = self._end_arrays('start')
+        V2, p2 = self._end_arrays('end')
+        return (p1 + p2) / 2 * (V2 - V1)
+
+    def heat_in(self, gamma=None):
+        gamma = self._gamma(gamma)
+        V1, p1 = self._end_arrays('start')
+        V2, p2 = self._end_arrays('end')
+        # dQ/dV = (gamma p + V dp/dV) / (gamma - 1) is linear in V
+        with np.errstate(all='ignore'):
+            k = (p2 - p1) / (V2 - V1)
+            Vt = gamma * (k * V1 - p1) / ((gamma + 1) * k)
+            pt = p1 + k * (Vt - V1)
+        return heat_received(V1, p1, V2, p2, Vt, pt, gamma,
+                             lambda Va, pa, Vb, pb: (pa + pb) / 2 * (Vb - Va))
+
     def plot(self, ax, config):
         if self.start and self.end:
-            V1, p1 = self.start
-            V2, p2 = self.end
-            self.x_values = np.linspace(V1, V2, 100)
-            self.y_values = np.linspace(p1, p2, 100)
+            self._evaluate()
             super().plot(ax, config)
 
 class Iso_t(Process):
+    __slots__ = ()
+    _key_attributes = ()
+
     def __init__(self):
         super().__init__()
         self.type = 'iso_t'
 
+    def _curve(self, t):
+        V1, p1 = self.start
+        V2, p2 = self.end
+        V = V1 + (V2 - V1) * t
+        return V, p1 * V1 / V
+
+    def work(self):
+        V1, p1 = self._end_arrays('start')
+        V2, _ = self._end_arrays('end')
+        return p1 * V1 * np.log(V2 / V1)
+
+    def delta_u(self, gamma=None):
+        return np.zeros_like(self.work())[()]
+
+    def heat_in(self, gamma=None):
+        return np.maximum(self.work(), 0)
+
     def plot(self, ax, config):
         #if self.start is None:
             #if self.drawing and self.drawing.last_point:
@@ -365,16 +692,11 @@ class Iso_t(Process):
             #else:
                 #raise ValueError("Start point must be set for 'Iso_t' process.")
 
-        V1, p1 = self.start
-
         # If the end point is not defined, use parameters from the to() method
         if self.end is None:
             raise ValueError("End point must be set for 'Iso_t' process.")
 
-        V2, p2 = self.end
-
-        self.x_values = np.linspace(V1, V2, 100)
-        self.y_values = p1 * V1 / self.x_values
+        self._evaluate()
         super().plot(ax, config)
 
     def to(self, end, end_type="pressure"):
@@ -393,28 +715,63 @@ class Iso_t(Process):
         return self
 
 class Power(Process):
+    __slots__ = ('power',)
+    _key_attributes = ('power',)
+
     def __init__(self, power=2, drawing=None):
         super().__init__()
         self.type = 'power'
         self.power = power
 
-    def plot(self, ax, config):
-
+    def _curve(self, t):
         x1, y1 = self.start
-
-        # If the end point is not defined, use parameters from the to() method
-        if self.end is None:
-            raise ValueError("End point must be set for 'Power' process.")
-
         x2, y2 = self.end
 
         # y = kx^n + b
         # Solving the system of equations to find k and b
         k = (y2 - y1) / (x2**self.power - x1**self.power)
         b = y1 - k * x1**self.power
-        self.x_values = np.linspace(x1, x2, 100)
-        self.y_values = k * self.x_values**self.power + b
+        x = x1 + (x2 - x1) * t
+        return x, k * x**self.power + b
+
+    # k and b of p = k V^n + b, and the work between two volumes
+    def _coefficients(self):
+        V1, p1 = self._end_arrays('start')
+        V2, p2 = self._end_arrays('end')
+        n = self.power
+        k = (p2 - p1) / (V2**n - V1**n)
+        return k, p1 - k * V1**n
+
+    def _work_between(self, Va, Vb, k, b):
+        n = self.power
+        if n == -1:
+            return k * np.log(Vb / Va) + b * (Vb - Va)
+        return k * (Vb**(n + 1) - Va**(n + 1)) / (n + 1) + b * (Vb - Va)
+
+    def work(self):
+        V1, _ = self._end_arrays('start')
+        V2, _ = self._end_arrays('end')
+        return self._work_between(V1, V2, *self._coefficients())
+
+    def heat_in(self, gamma=None):
+        gamma = self._gamma(gamma)
+        V1, p1 = self._end_arrays('start')
+        V2, p2 = self._end_arrays('end')
+        k, b = self._coefficients()
+        n = self.power
+        # dQ/dV = (k (gamma + n) V^n + gamma b) / (gamma - 1)
+        with np.errstate(all='ignore'):
+            Vt = (-gamma * b / (k * (gamma + n)))**(1 / n)
+            pt = k * Vt**n + b
+        return heat_received(V1, p1, V2, p2, Vt, pt, gamma,
+                             lambda Va, pa, Vb, pb: self._work_between(Va, Vb, k, b))
 
+    def plot(self, ax, config):
+        # If the end point is not defined, use parameters from the to() method
+        if self.end is None:
+            raise ValueError("End point must be set for 'Power' process.")
+
+        self._evaluate()
         super().plot(ax, config)
 
     def to(self, end, end_type='x'):
@@ -435,11 +792,31 @@ class Power(Process):
         return self
 
 class Adiabatic(Process):
+    __slots__ = ('gamma',)
+    _key_attributes = ('gamma',)
+
     def __init__(self, gamma=5/3):
         super().__init__()
         self.gamma = gamma
         self.type = 'adiabatic'
 
+    def _curve(self, t):
+        V1, p1 = self.start
+        V2, p2 = self.end
+        V = V1 + (V2 - V1) * t
+        return V, (p1 * V1 ** self.gamma) / V ** self.gamma
+
+    def _gamma(self, gamma):
+        return self.gamma if gamma is None else gamma
+
+    def work(self):
+        V1, p1 = self._end_arrays('start')
+        V2, p2 = self._end_arrays('end')
+        return (p1 * V1 - p2 * V2) / (self.gamma - 1)
+
+    def heat_in(self, gamma=None):
+        return np.maximum(self.heat(gamma), 0)
+
     def plot(self, ax, config):
         #if self.start is None:
             #if self.drawing and self.drawing.last_point:
@@ -447,16 +824,11 @@ class Adiabatic(Process):
             #else:
                 #raise ValueError("Start point must be set for 'Adiabatic' process.")
 
-        V1, p1 = self.start
-
         # If the end point is not defined, use parameters from the to() method
         if self.end is None:
             raise ValueError("End point must be set for 'Adiabatic' process.")
 
-        V2, p2 = self.end
-
-        self.x_values = np.linspace(V1, V2, 100)
-        self.y_values = (p1 * V1 ** self.gamma) / self.x_values ** self.gamma
+        self._evaluate()
         super().plot(ax, config)
 
     def to(self, end, end_type="pressure"):
@@ -475,6 +847,9 @@ class Adiabatic(Process):
         return self
 
 class Bezier(Process):
+    __slots__ = ('x', 'y', 'x1', 'y1', 'x2', 'y2', 'coordinates')
+    _key_attributes = ('x', 'y', 'x1', 'y1', 'x2', 'y2')
+
     def __init__(self, x=0, y=0, x1=None, y1=None, x2=None, y2=None):
         super().__init__()
         self.type = 'bezier'
@@ -529,46 +904,54 @@ class Bezier(Process):
 
         return intersection_x, intersection_y
 
+    def _curve(self, t):
+        x1, y1 = self.start
+        x2, y2 = self.end
+
+        if self.x1 is not None and self.x2 is not None:
+            # Third-order Bezier curve
+            x = (1-t)**3 * x1 + 3 * (1-t)**2 * t * self.x1 + 3 * (1-t) * t**2 * self.x2 + t**3 * x2
+            y = (1-t)**3 * y1 + 3 * (1-t)**2 * t * self.y1 + 3 * (1-t) * t**2 * self.y2 + t**3 * y2
+        else:
+            # Second-order Bezier curve
+            x = (1-t)**2 * x1 + 2 * (1-t) * t * self.x + t**2 * x2
+            y = (1-t)**2 * y1 + 2 * (1-t) * t * self.y + t**2 * y2
+        return x, y
+
+    # Coefficients of x(t) and y(t) in powers of t
+    def _coefficients(self):
+        V1, p1 = self._end_arrays('start')
+        V2, p2 = self._end_arrays('end')
+        if self.x1 is not None and self.x2 is not None:
+            points = [(V1, p1), (self.x1, self.y1), (self.x2, self.y2), (V2, p2)]
+            basis = [[1, 0, 0, 0], [-3, 3, 0, 0], [3, -6, 3, 0], [-1, 3, -3, 1]]
+        else:
+            points = [(V1, p1), (self.x, self.y), (V2, p2)]
+            basis = [[1, 0, 0], [-2, 2, 0], [1, -2, 1]]
+        return ([sum(c * x for c, (x, _) in zip(row, points)) for row in basis],
+                [sum(c * y for c, (_, y) in zip(row, points)) for row in basis])
+
+    def work(self):
+        return polynomial_work(*self._coefficients())
+
     def plot(self, ax, config):
         # Needed to store x_values
         if self.start and self.end: # Why this check? What happens else?
-            x1, y1 = self.start
-            x2, y2 = self.end
-            t = np.linspace(0, 1, 100)
-
-            if self.x1 is not None and self.x2 is not None:
-                # Third-order Bezier curve
-                self.x_values = (1-t)**3 * x1 + 3 * (1-t)**2 * t * self.x1 + 3 * (1-t) * t**2 * self.x2 + t**3 * x2
-                self.y_values = (1-t)**3 * y1 + 3 * (1-t)**2 * t * self.y1 + 3 * (1-t) * t**2 * self.y2 + t**3 * y2
-            else:
-                # Second-order Bezier curve
-                self.x_values = (1-t)**2 * x1 + 2 * (1-t) * t * self.x + t**2 * x2
-                self.y_values = (1-t)**2 * y1 + 2 * (1-t) * t * self.y + t**2 * y2
-
+            self._evaluate()
             super().plot(ax, config)
 
+    # n-th of NUM_SAMPLES points along the curve, whatever sample count is
+    # used for drawing
     def get_point(self, n):
         if self.start and self.end: # Why this check? What happens else?
-            x1, y1 = self.start
-            x2, y2 = self.end
-            t = np.linspace(0, 1, 100)
-
-            if self.x1 is not None and self.x2 is not None:
-                # Third-order Bezier curve
-                self.x_values = (1-t)**3 * x1 + 3 * (1-t)**2 * t * self.x1 + 3 * (1-t) * t**2 * self.x2 + t**3 * x2
-                self.y_values = (1-t)**3 * y1 + 3 * (1-t)**2 * t * self.y1 + 3 * (1-t) * t**2 * self.y2 + t**3 * y2
-            else:
-                # Second-order Bezier curve
-                self.x_values = (1-t)**2 * x1 + 2 * (1-t) * t * self.x + t**2 * x2
-                self.y_values = (1-t)**2 * y1 + 2 * (1-t) * t * self.y + t**2 * y2
-
-            self.coordinates = list(zip(self.x_values, self.y_values))
+            self.coordinates = list(zip(*self._curve(np.linspace(0, 1, NUM_SAMPLES))))
         if 0 <= n < len(self.coordinates):
             return self.coordinates[n][0], self.coordinates[n][1]
         else:
             raise IndexError("Index out of the range of Bezier curve points.")
 
     def get_coordinates(self):
+        self._ensure_samples()
         self.coordinates = list(zip(self.x_values, self.y_values))
         if self.coordinates:
             # Split the list of tuples into two lists for x and y coordinates
@@ -579,6 +962,9 @@ class Bezier(Process):
 
 
 class Parabola(Process):
+    __slots__ = ('vertex_x', 'vertex_y', 'a', 'b', 'c')
+    _key_attributes = ('vertex_x', 'vertex_y')
+
     def __init__(self):
         super().__init__()
         self.type = 'parabola'
@@ -625,12 +1011,496 @@ class Parabola(Process):
 
         print(self.a, self.b, self.c)
         if self.start and self.end:
-            x1, y1 = self.start
-            x2, y2 = self.end
-            self.x_values = np.linspace(x1, x2, 100)
-            self.y_values = self.a * self.x_values**2 + self.b * self.x_values + self.c
+            self._evaluate()
             super().plot(ax, config)
 
+    def _curve(self, t):
+        self.calculate_coefficients()
+        x1, y1 = self.start
+        x2, y2 = self.end
+        x = x1 + (x2 - x1) * t
+        return x, self.a * x**2 + self.b * x + self.c
+
+    def work(self):
+        self.calculate_coefficients()
+        x1, _ = self.start
+        x2, _ = self.end
+        return (self.a * (x2**3 - x1**3) / 3 + self.b * (x2**2 - x1**2) / 2
+                + self.c * (x2 - x1))
+
+
+# Smooth curve through points: Spline([(1, 2), (3, 5), (6, 4), (9, 7)]).
+# Start and end are the first and last points. Every piece between two
+# points is a cubic Hermite curve; kind sets the tangents at the points:
+# - 'catmull-rom': parallel to the line between the neighbours
+# - 'natural': continuous curvature, zero curvature at the ends
+# - 'monotone': y(x) without overshoot (Fritsch-Carlson), x must be
+#   strictly increasing or decreasing
+class Spline(Process):
+    __slots__ = ('points', 'kind', 'tangents')
+    _key_attributes = ('kind',)
+
+    def __init__(self, points, kind='catmull-rom'):
+        super().__init__()
+        self.type = 'spline'
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(self.points) < 2:
+            raise ValueError("Spline needs at least two points.")
+        if kind not in ('catmull-rom', 'natural', 'monotone'):
+            raise ValueError(f"Unknown spline kind '{kind}'")
+        self.kind = kind
+        self.start = tuple(map(float, self.points[0]))
+        self.end = tuple(map(float, self.points[-1]))
+        # Tangents at both ends of every piece, per unit of its parameter
+        self.tangents = self._tangents()
+
+    def _tangents(self):
+        p = self.points
+        n = len(p)
+        chords = np.diff(p, axis=0)
+        if n == 2:
+            return chords, chords
+        if self.kind == 'catmull-rom':
+            m = np.empty_like(p)
+            m[1:-1] = (p[2:] - p[:-2]) / 2
+            m[0], m[-1] = chords[0], chords[-1]
+            return m[:-1], m[1:]
+        if self.kind == 'natural':
+            # m[i-1] + 4 m[i] + m[i+1] = 3 (p[i+1] - p[i-1]), 2 m + m' at the ends
+            bands = np.zeros((3, n))
+            bands[0, 1:] = 1
+            bands[1] = 4
+            bands[1, [0, -1]] = 2
+            bands[2, :-1] = 1
+            rhs = np.empty_like(p)
+            rhs[1:-1] = 3 * (p[2:] - p[:-2])
+            rhs[0], rhs[-1] = 3 * chords[0], 3 * chords[-1]
+            m = solve_banded((1, 1), bands, rhs)
+            return m[:-1], m[1:]
+        # monotone: slopes dy/dx of PCHIP, x linear along every piece
+        x, y = p[:, 0], p[:, 1]
+        h = np.diff(x)
+        if not (np.all(h > 0) or np.all(h < 0)):
+            raise ValueError("A monotone spline needs strictly increasing or decreasing x.")
+        order = slice(None) if h[0] > 0 else slice(None, None, -1)
+        slope = PchipInterpolator(x[order], y[order]).derivative()(x)
+        return (np.column_stack([h, slope[:-1] * h]),
+                np.column_stack([h, slope[1:] * h]))
+
+    def _curve(self, t):
+        pieces = len(self.points) - 1
+        u = np.asarray(t, dtype=float) * pieces
+        i = np.clip(np.floor(u).astype(int), 0, pieces - 1)
+        s = (u - i)[:, None]
+        s2, s3 = s * s, s * s * s
+        p0, p1 = self.points[i], self.points[i + 1]
+        m0, m1 = self.tangents[0][i], self.tangents[1][i]
+        xy = ((2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * m0
+              + (-2 * s3 + 3 * s2) * p1 + (s3 - s2) * m1)
+        return xy[:, 0], xy[:, 1]
+
+    def work(self):
+        p0, p1 = self.points[:-1], self.points[1:]
+        m0, m1 = self.tangents
+        coefficients = [p0, m0, -3 * p0 - 2 * m0 + 3 * p1 - m1, 2 * p0 + m0 - 2 * p1 + m1]
+        return float(np.sum(polynomial_work([c[:, 0] for c in coefficients],
+                                            [c[:, 1] for c in coefficients])))
+
+    def _geometry_key(self):
+        key = super()._geometry_key()
+        return key and key + (self.points.tobytes(),)
+
+    # At least SPLINE_PIECE_SAMPLES samples on every piece
+    def _num_samples(self, resolution=None):
+        n = super()._num_samples(resolution)
+        return max(n, SPLINE_PIECE_SAMPLES * (len(self.points) - 1) + 1)
+
+    # Exact tangents, scaled to one step of the default sampling like those
+    # of other processes
+    def tangent_at_end(self):
+        dx, dy = self.tangents[1][-1] * (len(self.points) - 1) / (NUM_SAMPLES - 1)
+        return (dx, dy)
+
+    def tangent_at_start(self):
+        dx, dy = self.tangents[0][0] * (len(self.points) - 1) / (NUM_SAMPLES - 1)
+        return (dx, dy)
+
+    def plot(self, ax, config):
+        self._evaluate()
+        super().plot(ax, config)
+
+
+# Measured data: Data(v, p) with arrays or np.memmap, or Data('cycle.csv'),
+# Data('cycle.npy'), Data('cycle.bin') (raw records of `ncols` numbers of
+# `dtype`). Files are memory-mapped or read in chunks, so the points need
+# not fit in memory. Start and end are the first and last points.
+#
+# For drawing the points are decimated to the output resolution ('resolution'
+# dpi or 'tolerance' points in the config, DATA_DPI otherwise):
+# method='minmax' keeps the extreme points of every pixel along the line
+# (see minmax_decimate()), 'lttb' reduces those further to about one point
+# per pixel with Largest-Triangle-Three-Buckets.
+class Data(Process):
+    __slots__ = ('x', 'y', 'path', 'method', 'columns', 'delimiter', 'skiprows')
+
+    def __init__(self, x, y=None, method='minmax', columns=(0, 1), delimiter=',',
+                 skiprows=0, dtype='float64', ncols=2):
+        super().__init__()
+        self.type = 'data'
+        if method not in ('minmax', 'lttb'):
+            raise ValueError(f"Unknown decimation method '{method}'")
+        self.method = method
+        self.columns = tuple(columns)
+        self.delimiter = delimiter
+        self.skiprows = skiprows
+        self.path = None
+        if y is None:
+            path = os.fspath(x)
+            extension = os.path.splitext(path)[1].lower()
+            if extension in TEXT_EXTENSIONS:
+                self.path = path
+                self.x = self.y = None
+            else:
+                if extension == '.npy':
+                    table = np.load(path, mmap_mode='r')
+                else:
+                    table = np.memmap(path, dtype=dtype, mode='r').reshape(-1, ncols)
+                x, y = table[:, self.columns[0]], table[:, self.columns[1]]
+        if self.path is None:
+            # np.asarray() keeps memory-mapped arrays mapped
+            self.x, self.y = np.asarray(x), np.asarray(y)
+            if self.x.ndim != 1 or self.x.shape != self.y.shape:
+                raise ValueError("x and y must be 1-D arrays of the same length.")
+            if not len(self.x):
+                raise ValueError("Data has no points.")
+            self.start = (float(self.x[0]), float(self.y[0]))
+            self.end = (float(self.x[-1]), float(self.y[-1]))
+        else:
+            self.start, self.end = self._text_ends()
+
+    # First and last rows of a text file, without reading the rest
+    def _text_ends(self):
+        with open(self.path, 'rb') as f:
+            for _ in range(self.skiprows):
+                f.readline()
+            first = f.readline()
+            while first and not first.strip():
+                first = f.readline()
+            if not first:
+                raise ValueError(f"No data in {self.path}")
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            tail = b''
+            while position > 0 and len(tail.strip().splitlines()) < 2:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                tail = f.read(step) + tail
+            last = tail.strip().splitlines()[-1]
+        rows = np.loadtxt([first.decode(), last.decode()], delimiter=self.delimiter,
+                          usecols=self.columns, ndmin=2)
+        return tuple(map(float, rows[0])), tuple(map(float, rows[1]))
+
+    # Points in chunks of at most DATA_CHUNK
+    def _chunks(self):
+        if self.path is None:
+            for i in range(0, len(self.x), DATA_CHUNK):
+                yield (np.asarray(self.x[i:i + DATA_CHUNK], dtype=float),
+                       np.asarray(self.y[i:i + DATA_CHUNK], dtype=float))
+            return
+        with open(self.path) as f:
+            for _ in range(self.skiprows):
+                next(f, None)
+            while True:
+                lines = [line for line in islice(f, DATA_CHUNK) if line.strip()]
+                if not lines:
+                    break
+                rows = np.loadtxt(lines, delimiter=self.delimiter,
+                                  usecols=self.columns, ndmin=2)
+                yield rows[:, 0], rows[:, 1]
+
+    # Pixels per data unit along x and y at the output resolution
+    def _pixel_scale(self):
+        config = self.config or {}
+        if config.get('resolution') is not None:
+            dpi = config['resolution']
+        elif config.get('tolerance') is not None:
+            dpi = 72 / config['tolerance']
+        else:
+            dpi = DATA_DPI
+        sx, sy = data_scale(config)
+        return sx * dpi, sy * dpi
+
+    def _evaluate(self):
+        scale = self._pixel_scale()
+        parts = [minmax_decimate(x, y, scale) for x, y in self._chunks()]
+        x = np.concatenate([part[0] for part in parts])
+        y = np.concatenate([part[1] for part in parts])
+        if self.method == 'lttb':
+            n = int(pixel_length(x * scale[0], y * scale[1])) + 2
+            x, y = lttb_decimate(x, y, n, scale)
+        self.x_values, self.y_values = x, y
+
+    # Work and heat received over all points (trapezoids between them)
+    def _integrals(self, gamma):
+        work = heat_in = 0.0
+        previous = None
+        for V, p in self._chunks():
+            if previous is not None:
+                V, p = np.insert(V, 0, previous[0]), np.insert(p, 0, previous[1])
+            dw = (p[1:] + p[:-1]) / 2 * np.diff(V)
+            dq = np.diff(p * V) / (gamma - 1) + dw
+            work += np.nansum(dw)
+            heat_in += np.nansum(np.maximum(dq, 0))
+            previous = V[-1], p[-1]
+        return work, heat_in
+
+    def work(self):
+        return self._integrals(GAMMA)[0]
+
+    def heat_in(self, gamma=None):
+        return self._integrals(self._gamma(gamma))[1]
+
+    def tangent_at_end(self):
+        self._ensure_samples()
+        if self.x_values is None or len(self.x_values) < 2:
+            return None
+        return (self.x_values[-1] - self.x_values[-2], self.y_values[-1] - self.y_values[-2])
+
+    def tangent_at_start(self):
+        self._ensure_samples()
+        if self.x_values is None or len(self.x_values) < 2:
+            return None
+        return (self.x_values[1] - self.x_values[0], self.y_values[1] - self.y_values[0])
+
+    def plot(self, ax, config):
+        self._evaluate()
+        super().plot(ax, config)
+
+
+# Curves given by vectorized functions:
+#
+#     Function(lambda v: R*T / (v - b) - a / v**2, (0.1, 10))   # y = f(x)
+#     Parametric(np.cos, np.sin, (0, np.pi))                   # (fx(t), fy(t))
+#
+# Start and end are the points at the ends of the range. The functions are
+# called on arrays, once per refinement round: intervals are halved where
+# the curve deviates from the chord by more than the tolerance ('tolerance'
+# or half a pixel at 'resolution', half a pixel at DATA_DPI otherwise).
+# Intervals that do not converge because one half holds nearly all of the
+# chord, as at poles and jumps, are left as gaps in the line.
+class Parametric(Process):
+    __slots__ = ('fx', 'fy', 't_range')
+
+    def __init__(self, fx, fy, t_range=(0, 1)):
+        super().__init__()
+        self.type = 'parametric'
+        self.fx = fx
+        self.fy = fy
+        self.t_range = tuple(t_range)
+        x, y = self._curve(np.array([0.0, 1.0]))
+        self.start = (float(x[0]), float(y[0]))
+        self.end = (float(x[1]), float(y[1]))
+
+    def _curve(self, t):
+        t0, t1 = self.t_range
+        t = t0 + (t1 - t0) * np.asarray(t, dtype=float)
+        with np.errstate(all='ignore'):
+            x = np.broadcast_to(np.asarray(self.fx(t), dtype=float), t.shape)
+            y = np.broadcast_to(np.asarray(self.fy(t), dtype=float), t.shape)
+        return x, y
+
+    def _sample(self, resolution=None):
+        config = self.config or {}
+        if resolution is None and config.get('tolerance') is not None:
+            eps = config['tolerance'] / 72
+        else:
+            eps = 0.5 / (resolution or config.get('resolution') or DATA_DPI)
+        sx, sy = data_scale(config)
+        # Parts far outside the limits are not refined
+        (x0, x1), (y0, y1) = config.get('xlim', [0, 11.2]), config.get('ylim', [0, 11.2])
+        mx, my = abs(x1 - x0), abs(y1 - y0)
+        xmin, xmax = min(x0, x1) - mx, max(x0, x1) + mx
+        ymin, ymax = min(y0, y1) - my, max(y0, y1) + my
+
+        t = np.linspace(0, 1, PILOT_SAMPLES)
+        x, y = self._curve(t)
+        active = np.ones(len(t) - 1, dtype=bool)
+        jump = np.zeros(len(t) - 1, dtype=bool)
+        for _ in range(MAX_DEPTH):
+            index = np.flatnonzero(active)
+            if not len(index) or len(t) + len(index) > MAX_ADAPTIVE_SAMPLES:
+                break
+            tm = (t[index] + t[index + 1]) / 2
+            xm, ym = self._curve(tm)
+            # Chord and its halves in inches
+            ax, ay = x[index] * sx, y[index] * sy
+            bx, by = x[index + 1] * sx, y[index + 1] * sy
+            cx, cy = xm * sx, ym * sy
+            with np.errstate(all='ignore'):
+                chord = np.hypot(bx - ax, by - ay)
+                left, right = np.hypot(cx - ax, cy - ay), np.hypot(bx - cx, by - cy)
+                half = np.maximum(left, right)
+                deviation = np.abs((bx - ax) * (cy - ay) - (by - ay) * (cx - ax)) / chord
+                deviation = np.where(chord > 0, deviation, half)
+                split = (half > JUMP_RATIO * chord) & (chord > 2 * eps)
+                outside = ((np.maximum(x[index], x[index + 1]) < xmin) & (xm < xmin)) | \
+                          ((np.minimum(x[index], x[index + 1]) > xmax) & (xm > xmax)) | \
+                          ((np.maximum(y[index], y[index + 1]) < ymin) & (ym < ymin)) | \
+                          ((np.minimum(y[index], y[index + 1]) > ymax) & (ym > ymax))
+            finite = np.isfinite(chord) & np.isfinite(half)
+            refine = ((deviation > eps) | split | ~finite) & ~outside
+            # A jump is followed into the half that holds it
+            flags = np.zeros(len(t) - 1, dtype=bool)
+            flags[index] = refine & ~(split & (left < right))
+            jumps = np.zeros(len(t) - 1, dtype=bool)
+            jumps[index] = (split | ~finite) & ~outside
+            active = np.insert(flags, index + 1, refine & ~(split & (left >= right)))
+            jump = np.insert(jumps, index + 1, jumps[index])
+            t = np.insert(t, index + 1, tm)
+            x = np.insert(x, index + 1, xm)
+            y = np.insert(y, index + 1, ym)
+
+        # Gaps at poles and jumps, and at points where the functions are
+        # not finite
+        gaps = np.flatnonzero(active & jump) + 1
+        x = np.insert(x, gaps, np.nan)
+        y = np.insert(y, gaps, np.nan)
+        bad = ~(np.isfinite(x) & np.isfinite(y))
+        x[bad] = y[bad] = np.nan
+        # Cut off at the limits with a margin, so that poles do not stretch
+        # the axes
+        box = (min(x0, x1) - CLIP_MARGIN * mx, max(x0, x1) + CLIP_MARGIN * mx,
+               min(y0, y1) - CLIP_MARGIN * my, max(y0, y1) + CLIP_MARGIN * my)
+        return clip_polyline(x, y, box)
+
+    def plot(self, ax, config):
+        self._evaluate()
+        if self.x_values is not None and self.y_values is not None:
+            self.line, = ax.plot(self.x_values, self.y_values, color=self.color,
+                                 linestyle=self.linestyle, linewidth=self.linewidth,
+                                 zorder=self.zorder)
+            if self.arrow_params:
+                # The arrow is placed on the longest piece between gaps
+                pieces = np.split(np.arange(len(self.x_values)),
+                                  np.flatnonzero(np.isnan(self.x_values)))
+                piece = max(pieces, key=lambda p: np.isfinite(self.x_values[p]).sum())
+                piece = piece[np.isfinite(self.x_values[piece])]
+                if len(piece) > 1:
+                    self._add_arrow(ax, self.x_values[piece], self.y_values[piece])
+        self._add_labels(ax, config)
+
+
+class Function(Parametric):
+    __slots__ = ('f',)
+
+    def __init__(self, f, x_range):
+        self.f = f
+        super().__init__(lambda x: x, f, x_range)
+        self.type = 'function'
+
+
+# Polyline cut off at a box (xmin, xmax, ymin, ymax): points outside are
+# moved onto the border where the line leaves or enters the box, or become
+# gaps (NaN) if both neighbours are outside too
+def clip_polyline(x, y, box):
+    xmin, xmax, ymin, ymax = box
+    inside = (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+    if inside.all():
+        return x, y
+    before = np.r_[False, inside[:-1]]
+    after = np.r_[inside[1:], False]
+
+    # Point where the segment from an inside point p to q meets the border
+    def border(i, j):
+        px, py, qx, qy = x[i], y[i], x[j], y[j]
+        s = np.ones(len(i))
+        with np.errstate(all='ignore'):
+            for p, q, low, high in ((px, qx, xmin, xmax), (py, qy, ymin, ymax)):
+                s = np.fmin(s, np.where(q > high, (high - p) / (q - p), 1))
+                s = np.fmin(s, np.where(q < low, (low - p) / (q - p), 1))
+        return px + s * (qx - px), py + s * (qy - py)
+
+    new_x, new_y = x.copy(), y.copy()
+    outside = np.flatnonzero(~inside & ~np.isnan(x))
+    new_x[outside] = new_y[outside] = np.nan
+    leave = outside[before[outside]]
+    new_x[leave], new_y[leave] = border(leave - 1, leave)
+    enter = outside[after[outside] & ~before[outside]]
+    new_x[enter], new_y[enter] = border(enter + 1, enter)
+    # A point outside between two inside points: leave, gap, enter again
+    both = outside[after[outside] & before[outside]]
+    ex, ey = border(both + 1, both)
+    gap = np.full(len(both), np.nan)
+    positions = np.concatenate([enter, np.repeat(both + 1, 2)])
+    order = np.argsort(positions, kind='stable')
+    values_x = np.concatenate([np.full(len(enter), np.nan), np.ravel([gap, ex], 'F')])
+    values_y = np.concatenate([np.full(len(enter), np.nan), np.ravel([gap, ey], 'F')])
+    new_x = np.insert(new_x, positions[order], values_x[order])
+    new_y = np.insert(new_y, positions[order], values_y[order])
+    return new_x, new_y
+
+
+# Length in pixels of a path through the means of PILOT_BLOCKS blocks of
+# points: noise averages out, so it is about the length of the drawn line
+def pixel_length(px, py):
+    size = max(len(px) // PILOT_BLOCKS, 1)
+    n = len(px) // size * size
+    if n < 2 * size:
+        return float(np.hypot(np.ptp(px), np.ptp(py)))
+    mx = px[:n].reshape(-1, size).mean(axis=1)
+    my = py[:n].reshape(-1, size).mean(axis=1)
+    return float(np.hypot(np.diff(mx), np.diff(my)).sum())
+
+
+# Min/max decimation: points are split into runs of consecutive points about
+# one pixel long (by pixel_length()), and the lowest, highest, leftmost and
+# rightmost point of every run are kept, in their order. For y(t) data this
+# is the min/max of every pixel column; it works as well for paths that
+# turn back, like cycles. `scale` converts x and y to pixels.
+def minmax_decimate(x, y, scale=(1, 1)):
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    px, py = x * scale[0], y * scale[1]
+    runs = int(np.ceil(pixel_length(px, py))) + 1
+    size = len(x) // runs
+    if size < 5:
+        return x, y
+    n = len(x) // size * size
+    offsets = np.arange(0, n, size)
+    keep = [0, len(x) - 1, np.arange(n, len(x))]
+    for values in (px, py):
+        blocks = values[:n].reshape(-1, size)
+        keep += [offsets + blocks.argmin(axis=1), offsets + blocks.argmax(axis=1)]
+    keep = np.unique(np.concatenate([np.atleast_1d(k) for k in keep]))
+    return x[keep], y[keep]
+
+
+# Largest-Triangle-Three-Buckets: n points (first, last and one per bucket)
+# that keep the visual shape. `scale` converts x and y to pixels, so areas
+# are compared as they look on the figure.
+def lttb_decimate(x, y, n, scale=(1, 1)):
+    if n >= len(x) or n < 3:
+        return x, y
+    sx, sy = x * scale[0], y * scale[1]
+    edges = np.linspace(1, len(x) - 1, n - 1).astype(int)
+    keep = [0]
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i + 2 < len(edges):
+            next_x = sx[hi:edges[i + 2]].mean() if edges[i + 2] > hi else sx[hi]
+            next_y = sy[hi:edges[i + 2]].mean() if edges[i + 2] > hi else sy[hi]
+        else:
+            next_x, next_y = sx[-1], sy[-1]
+        area = np.abs((sx[a] - next_x) * (sy[lo:hi] - sy[a])
+                      - (sx[a] - sx[lo:hi]) * (next_y - sy[a]))
+        a = lo + int(np.argmax(area))
+        keep.append(a)
+    keep.append(len(x) - 1)
+    keep = np.unique(keep)
+    return x[keep], y[keep]
+
 
 #def end_x(process):
     #if process.type == 'power':
@@ -668,6 +1538,37 @@ class Parabola(Process):
         #return (p1 * V1 ** process.gamma) / V2 ** process.gamma
     #return None
 
+# Work of a polynomial curve: x(t), y(t) given by coefficients of powers
+# of t (numbers or arrays), integral of y dx for t from 0 to 1
+def polynomial_work(x_coefficients, y_coefficients):
+    total = 0
+    for i, cy in enumerate(y_coefficients):
+        for j, cx in enumerate(x_coefficients):
+            if j:
+                total = total + cy * cx * j / (i + j)
+    return total
+
+
+# Heat received from (V1, p1) to (V2, p2) along a process whose heat flow
+# changes sign at most at (Vt, pt) (NaN if it does not); work(Va, pa, Vb, pb)
+# is the work between two of its points
+def heat_received(V1, p1, V2, p2, Vt, pt, gamma, work):
+    def heat(Va, pa, Vb, pb):
+        return (pb * Vb - pa * Va) / (gamma - 1) + work(Va, pa, Vb, pb)
+    with np.errstate(all='ignore'):
+        turns = (Vt - V1) * (Vt - V2) < 0
+        whole = np.maximum(heat(V1, p1, V2, p2), 0)
+        parts = np.maximum(heat(V1, p1, Vt, pt), 0) + np.maximum(heat(Vt, pt, V2, p2), 0)
+    return np.where(turns, parts, whole)[()]
+
+
+# Efficiency of a cycle: net work over the heat received. Parameters of the
+# processes may be arrays to compute many cycles at once.
+def cycle_efficiency(processes, gamma=None):
+    work = sum(process.work() for process in processes)
+    heat_in = sum(process.heat_in(gamma) for process in processes)
+    return work / heat_in
+
 # Find intersection adiabatic and iso_t using (v1,p1) and (v3,p3)
 def common_pv(v1, p1, v3, p3, gamma=5/3):
     v2 = v1**(gamma/(gamma-1)) * (p1 / (p3 * v3))**(1/(gamma-1))
@@ -708,3 +1609,42 @@ def interpolate_curve(x_values, y_values, num_points=100):
     new_y_values = f_y(distance)
 
     return new_x_values, new_y_values
+
+# Inches per data unit along x and y. The axes box of a figure of
+# rcParams['figure.figsize'] is shrunk to the aspect of the limits, as
+# ax.set_aspect() does.
+def data_scale(config):
+    width, height = rcParams['figure.figsize']
+    width *= rcParams['figure.subplot.right'] - rcParams['figure.subplot.left']
+    height *= rcParams['figure.subplot.top'] - rcParams['figure.subplot.bottom']
+    xlim = config.get('xlim', [0, 11.2])
+    ylim = config.get('ylim', [0, 11.2])
+    xlen = abs(xlim[1] - xlim[0]) or 1
+    ylen = abs(ylim[1] - ylim[0]) or 1
+    aspect = config.get('aspect', 1)
+    if aspect == 'auto':
+        return width / xlen, height / ylen
+    if aspect == 'equal':
+        aspect = 1
+    scale = min(width / xlen, height / (ylen * aspect))
+    return scale, scale * aspect
+
+# Positions equally spaced by arc length along a chain of processes.
+# Used to animate a state moving along a cycle. y is scaled by the aspect so
+# that equal steps look equal on the figure.
+def uniform_positions(processes, num_points=100, aspect=1):
+    x_parts, y_parts = [], []
+    for process in processes:
+        if process.x_values is None:
+            process._evaluate()
+        x_parts.append(np.asarray(process.x_values, dtype=float))
+        y_parts.append(np.asarray(process.y_values, dtype=float))
+    x_values = np.concatenate(x_parts)
+    y_values = np.concatenate(y_parts)
+
+    segment = np.hypot(np.diff(x_values), np.diff(y_values) * aspect)
+    length_along_path = np.insert(np.cumsum(segment), 0, 0)
+    distance = np.linspace(0, length_along_path[-1], num_points)
+
+    return np.interp(distance, length_along_path, x_values), \
+           np.interp(distance, length_along_path, y_values)
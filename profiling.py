@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from matplotlib.text import Text
+
+
+# Shared no-op context for phases of a drawing without profiling
+NO_PHASE = nullcontext()
+
+# Stats counting drawn texts, by id of their figure
+TEXT_DRAW = Text.draw
+TEXT_COUNTERS = {}
+TEXT_COUNT_LOCK = threading.Lock()
+
+
+def _counting_draw(text, renderer):
+    # The figure of a text in a subfigure is the subfigure, its .figure the root
+    figure = getattr(text.figure, 'figure', text.figure)
+    stats = TEXT_COUNTERS.get(id(figure))
+    if stats is not None and text.get_visible() and text.get_text():
+        stats.text_renders += 1
+        if text.get_usetex():
+            stats.tex_renders += 1
+    return TEXT_DRAW(text, renderer)
+
+
+# Render statistics of a drawing, enabled with d.profile().
+#
+#     d.stats.phases        list of {'name', 'time', ...} in call order
+#     d.stats.totals()      total time per phase name; 'axes/grid' is a part
+#                           of 'axes' and already included in its time
+#     d.stats.artists       artist counts by type after show() / save()
+#     d.stats.text_renders  number of drawn texts (LaTeX ones included)
+#     d.stats.tex_renders   number of texts drawn through LaTeX
+#
+# Callbacks added with subscribe() are called as callback(name, seconds, info)
+# after every recorded phase.
+class Stats:
+    def __init__(self):
+        self.phases = []
+        self.artists = Counter()
+        self.text_renders = 0
+        self.tex_renders = 0
+        self.callbacks = []
+
+    def subscribe(self, callback):
+        self.callbacks.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        self.callbacks.remove(callback)
+
+    @contextmanager
+    def phase(self, name, **info):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - t0
+            self.phases.append({'name': name, 'time': seconds, **info})
+            for callback in self.callbacks:
+                callback(name, seconds, info)
+
+    def totals(self):
+        totals = {}
+        for phase in self.phases:
+            totals[phase['name']] = totals.get(phase['name'], 0) + phase['time']
+        return totals
+
+    def count_artists(self, fig):
+        self.artists = Counter(type(artist).__name__ for artist in fig.findobj()
+                               if artist is not fig)
+
+    # Count texts of `fig` drawn inside the block. Text.draw is replaced
+    # process-wide while any profiled drawing is being saved; texts of other
+    # figures (saved in other threads meanwhile) are drawn but not counted.
+    @contextmanager
+    def count_texts(self, fig):
+        with TEXT_COUNT_LOCK:
+            if not TEXT_COUNTERS:
+                Text.draw = _counting_draw
+            TEXT_COUNTERS[id(fig)] = self
+        try:
+            yield
+        finally:
+            with TEXT_COUNT_LOCK:
+                del TEXT_COUNTERS[id(fig)]
+                if not TEXT_COUNTERS:
+                    Text.draw = TEXT_DRAW
+
+    def report(self):
+        lines = [f'{name:20s} {seconds * 1000:9.2f} ms'
+                 for name, seconds in self.totals().items()]
+        lines.append(f'texts drawn: {self.text_renders} (LaTeX: {self.tex_renders})')
+        lines.append('artists: ' + ', '.join(f'{name} {count}' for name, count
+                                              in self.artists.most_common()))
+        return '\n'.join(lines)
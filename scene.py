@@ -0,0 +1,123 @@
+import json
+import matplotlib.pyplot as plt
+from . import processes
+from .drawing import Drawing
+from .global_drawing import GLOBAL_DRAWING
+
+
+# Scenes describe a drawing as plain data (JSON), so it can be rendered
+# without running Python code:
+#
+#     {
+#       "config": {"xname": "$V$", "yname": "$p$", "zero_x": 0.5},
+#       "processes": [
+#         {"type": "Adiabatic", "at": [3, 9], "to": [9, "volume"],
+#          "arrow": true, "dot": "end"},
+#         {"type": "Iso_t", "to": [3, "volume"], "arrow": true, "dot": true,
+#          "label": {"text1": 2, "dy": 0}},
+#         {"type": "Linear", "to": [3, 9], "arrow": true, "label": [3, 1]}
+#       ],
+#       "grid": {"step": 1, "x_end": 9},
+#       "xticks": {"xticks": [3, 9], "names": ["$V_1$", "$V_2$"]}
+#     }
+#
+# "args" holds constructor arguments of a process. Other keys are method
+# calls: a list is passed as positional arguments, an object as keyword
+# arguments, true calls the method without arguments, anything else is a
+# single argument.
+
+# Process methods in the order they are applied
+METHODS = ['vertex', 'at', 'to', 'arrow', 'dot', 'label', 'col', 'ls', 'lw',
+           'zord', 'tox', 'toy', 'tozero', 'xtick', 'ytick']
+
+PROCESS_TYPES = {name: getattr(processes, name) for name in
+                 ['Linear', 'Power', 'Iso_t', 'Adiabatic', 'Bezier',
+                  'Parabola', 'Spline', 'State', 'States', 'Data']}
+
+
+def _call(method, value):
+    if value is True:
+        return method()
+    if isinstance(value, list):
+        return method(*value)
+    if isinstance(value, dict):
+        return method(**value)
+    return method(value)
+
+
+# Config keys a scene from an untrusted client (server.py) may set: limits,
+# names, sizes and output settings. 'font' is not among them, as any font but
+# STIX turns on LaTeX, which could read server files through labels.
+UNTRUSTED_CONFIG = {'fontsize', 'lw', 'aspect', 'xlim', 'ylim', 'xname', 'yname',
+                    'yname_y', 'xname_x', 'xname_ofst', 'yname_ofst', 'zero',
+                    'zero_x', 'zero_ofst', 'axes_arrow_width', 'axes_arrow_length',
+                    'axes_arrow_scale', 'arrow_size', 'tick_width', 'tick_length',
+                    'center_x', 'center_y', 'center', 'y_gap', 'y_gap_size',
+                    'label_placement', 'resolution', 'tolerance', 'svg_precision',
+                    'svg_tolerance', 'deterministic'}
+
+
+def _untrusted_config(config):
+    unknown = sorted(set(config) - UNTRUSTED_CONFIG)
+    if unknown:
+        raise ValueError(f"Config keys not allowed in this scene: {', '.join(unknown)}")
+    return {**config, 'font': 'stix'}
+
+
+# Scenes come from untrusted clients (server.py), so Data takes its points
+# inline only: a path in x would let a scene read any file of the server
+def _check_inline_data(args):
+    for name in ('x', 'y'):
+        values = args.get(name)
+        if not isinstance(values, list) or not all(
+                isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            raise ValueError(f"Data in a scene needs '{name}' as a list of numbers")
+
+
+def load_scene(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+# Build a drawing from a scene and return it. The drawing is shown (axes are
+# built), so it can be saved right away. Scenes of other users (trusted=False)
+# may only set the config keys in UNTRUSTED_CONFIG and never use LaTeX.
+def render_scene(scene, trusted=True):
+    if isinstance(scene, (str, bytes)):
+        scene = json.loads(scene)
+
+    config = scene.get('config', {})
+    if not trusted:
+        config = _untrusted_config(config)
+    with Drawing() as d:
+        d.set_config(**config)
+        if not trusted and plt.rcParams['text.usetex']:
+            raise RuntimeError('LaTeX must not be used for untrusted scenes')
+        for item in scene.get('processes', []):
+            if item.get('type') not in PROCESS_TYPES:
+                raise ValueError(f"Unknown process type '{item.get('type')}'")
+            args = item.get('args', {})
+            if item['type'] == 'Data':
+                _check_inline_data(args)
+            process = PROCESS_TYPES[item['type']](**args)
+            for name in METHODS:
+                if name in item:
+                    _call(getattr(process, name), item[name])
+        if 'grid' in scene:
+            _call(d.grid, scene['grid'])
+        if 'xticks' in scene:
+            _call(d.add_xticks, scene['xticks'])
+        if 'yticks' in scene:
+            _call(d.add_yticks, scene['yticks'])
+        d.show()
+    return d
+
+
+# Render a scene to bytes in the given format ('svg', 'png', 'pdf')
+def render_bytes(scene, format='svg', crop=False, dpi=None, trusted=True):
+    try:
+        d = render_scene(scene, trusted)
+        return d.to_bytes(format, crop=crop, dpi=dpi)
+    finally:
+        GLOBAL_DRAWING.reset()
+        plt.close('all')
@@ -0,0 +1,219 @@
+# Local HTTP rendering service (stdlib only):
+#
+#     python -m plotnik.server --port 8765 --workers 4
+#
+#     POST /render?format=svg&crop=1   body: scene JSON (see scene.py)
+#     GET  /metrics                    queue depth, cache and latency stats
+#     GET  /health
+#
+# Scenes are rendered in a pool of pre-warmed worker processes. Identical
+# requests in flight share one render, and recent outputs are kept in an
+# in-memory LRU cache.
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from urllib.parse import urlsplit, parse_qs
+
+from .scene import render_bytes
+
+CONTENT_TYPES = {'svg': 'image/svg+xml', 'png': 'image/png', 'pdf': 'application/pdf'}
+MAX_BODY = 1 << 20
+
+WARM_UP_SCENE = {'config': {'xname': '$V$', 'yname': '$p$'},
+                 'processes': [{'type': 'Iso_t', 'at': [2, 8], 'to': [8, 'volume'],
+                                'arrow': True, 'dot': 'both', 'label': [1, 2]}]}
+
+
+# Runs once in every worker: loads matplotlib, fonts and mathtext
+def warm_up():
+    import matplotlib
+    matplotlib.use('Agg')
+    for fmt in CONTENT_TYPES:
+        render_bytes(WARM_UP_SCENE, fmt)
+
+
+class RenderService:
+    def __init__(self, workers=2, cache_size=256):
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(workers, initializer=warm_up)
+        self.cache = OrderedDict()  # key -> bytes, least recently used first
+        self.cache_size = cache_size
+        self.inflight = {}          # key -> asyncio.Future
+        self.latencies = deque(maxlen=1000)
+        self.counters = {'requests': 0, 'rendered': 0, 'cache_hits': 0,
+                         'coalesced': 0, 'errors': 0, 'pool_restarts': 0}
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    @staticmethod
+    def key(scene, fmt, crop):
+        canonical = json.dumps(scene, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(f'{fmt}:{crop}:{canonical}'.encode()).hexdigest()
+
+    async def render(self, scene, fmt='svg', crop=False):
+        self.counters['requests'] += 1
+        key = self.key(scene, fmt, crop)
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.counters['cache_hits'] += 1
+            return self.cache[key]
+
+        if key in self.inflight:
+            self.counters['coalesced'] += 1
+            return await asyncio.shield(self.inflight[key])
+
+        loop = asyncio.get_running_loop()
+        pool = self.pool
+        t0 = time.perf_counter()
+        try:
+            # Scenes come from any client: no LaTeX, limited config
+            future = loop.run_in_executor(pool, partial(render_bytes, trusted=False),
+                                          scene, fmt, crop)
+        except BrokenProcessPool:
+            self._restart(pool)
+            raise
+        self.inflight[key] = future
+        try:
+            data = await asyncio.shield(future)
+        except BrokenProcessPool:
+            self._restart(pool)
+            raise
+        except Exception:
+            self.counters['errors'] += 1
+            raise
+        finally:
+            del self.inflight[key]
+        self.latencies.append(time.perf_counter() - t0)
+        self.counters['rendered'] += 1
+
+        self.cache[key] = data
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return data
+
+    # A worker crashed: the pool takes no more jobs, so later requests get a
+    # new one; the failed request gets 500
+    def _restart(self, pool):
+        self.counters['errors'] += 1
+        if self.pool is pool:
+            self.counters['pool_restarts'] += 1
+            self.pool = ProcessPoolExecutor(self.workers, initializer=warm_up)
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+        def percentile(q):
+            return latencies[min(int(q * len(latencies)), len(latencies) - 1)] if latencies else None
+        return {**self.counters,
+                'queue_depth': len(self.inflight),
+                'cache_entries': len(self.cache),
+                'cache_bytes': sum(len(data) for data in self.cache.values()),
+                'latency_p50': percentile(0.5),
+                'latency_p95': percentile(0.95),
+                'latency_max': latencies[-1] if latencies else None}
+
+    ## HTTP
+
+    async def handle(self, reader, writer):
+        try:
+            status, content_type, body = await self._respond(reader)
+        except Exception as error:
+            status, content_type, body = 500, 'text/plain', str(error).encode()
+        head = (f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                'Connection: close\r\n\r\n')
+        writer.write(head.encode() + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _respond(self, reader):
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) < 2:
+            return 400, 'text/plain', b'bad request'
+        method, target = request_line[0], request_line[1]
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1')
+            if line in ('\r\n', '\n', ''):
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, 'text/plain', b'ok'
+        if url.path == '/metrics':
+            return 200, 'application/json', json.dumps(self.metrics()).encode()
+        if url.path != '/render':
+            return 404, 'text/plain', b'not found'
+        if method != 'POST':
+            return 405, 'text/plain', b'use POST'
+
+        length = int(headers.get('content-length', 0))
+        if length > MAX_BODY:
+            return 413, 'text/plain', b'scene is too large'
+        try:
+            scene = json.loads(await reader.readexactly(length))
+        except ValueError as error:
+            return 400, 'text/plain', f'invalid JSON: {error}'.encode()
+
+        query = parse_qs(url.query)
+        fmt = query.get('format', ['svg'])[0]
+        if fmt not in CONTENT_TYPES:
+            return 400, 'text/plain', f"unknown format '{fmt}'".encode()
+        crop = query.get('crop', ['0'])[0] in ('1', 'true', 'yes')
+        try:
+            data = await self.render(scene, fmt, crop)
+        except (ValueError, TypeError, KeyError) as error:
+            return 422, 'text/plain', f'{type(error).__name__}: {error}'.encode()
+        return 200, CONTENT_TYPES[fmt], data
+
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 413: 'Payload Too Large',
+               422: 'Unprocessable Entity', 500: 'Internal Server Error'}
+
+
+async def serve(host='127.0.0.1', port=8765, workers=2, cache_size=256):
+    service = RenderService(workers, cache_size)
+    # Start the workers now, so the first requests do not pay for warm-up
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[loop.run_in_executor(service.pool, time.sleep, 0)
+                           for _ in range(workers)])
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f'plotnik server on http://{host}:{port} ({workers} workers)')
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='plotnik.server',
+                                     description='Local HTTP rendering service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--cache-size', type=int, default=256,
+                        help='number of outputs kept in memory')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.cache_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
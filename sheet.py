@@ -0,0 +1,145 @@
+import copy
+import io
+import os
+import matplotlib.pyplot as plt
+from matplotlib import rcParams
+from .drawing import Drawing, SHOW_HOOKS
+
+
+# Several drawings in one figure, e.g. a worksheet of small graphs:
+#
+#     sheet = Sheet(2, 3)
+#     sheet.set_config(xname='$V$', yname='$p$')   # defaults for all cells
+#     with sheet.cell(0, 0) as d:
+#         d.set_config(xlim=[0, 8])                # options of this cell
+#         Adiabatic().at(3, 9).to(9, 'volume')
+#     ...
+#     sheet.show()
+#     sheet.save('sheet.svg')
+#     sheet.save_cells('cell-{row}-{col}.svg')
+#
+# Cells are Drawings with their own config, drawn on axes of the sheet
+# figure, so the sheet is rendered and saved once. Every cell is
+# figsize wide and high (rcParams['figure.figsize'] by default), so fonts
+# look as in a single drawing.
+class Sheet(Drawing):
+    def __init__(self, rows, cols, figsize=None, wspace=0.3, hspace=0.3):
+        super().__init__()
+        self.rows = rows
+        self.cols = cols
+        width, height = figsize or rcParams['figure.figsize']
+        self.fig = plt.figure(figsize=(cols * width, rows * height))
+        self.grid_spec = self.fig.add_gridspec(rows, cols, wspace=wspace, hspace=hspace)
+        self.cells = {}  # (row, col) -> Drawing
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        plt.close(self.fig)
+
+    # Options of the sheet are defaults for cells created afterwards
+    def set_config(self, **kwargs):
+        self.config.update(kwargs)
+
+    def add_process(self, process):
+        raise ValueError("Add processes to cells of a Sheet: sheet.cell(row, col)")
+
+    def cell(self, row, col):
+        if not (0 <= row < self.rows and 0 <= col < self.cols):
+            raise IndexError(f"Cell ({row}, {col}) is out of the {self.rows}x{self.cols} sheet")
+        if (row, col) not in self.cells:
+            d = Drawing()
+            d.sheet = self
+            d.id_prefix = f'cell-{row}-{col}-'
+            d.config.update(copy.deepcopy(self.config))
+            self.cells[row, col] = d
+            d.set_config()
+        return self.cells[row, col]
+
+    # Called by Drawing.update_rcParams(): axes of a cell, created again at
+    # every set_config() of the cell as for a single drawing
+    def _cell_axes(self, drawing):
+        row, col = next(pos for pos, d in self.cells.items() if d is drawing)
+        if drawing.ax is not None:
+            drawing.ax.remove()
+        return self.fig, self.fig.add_subplot(self.grid_spec[row, col])
+
+    def show(self):
+        self._render()
+
+        for hook in SHOW_HOOKS:
+            hook(self)
+        if 'inline' in plt.get_backend():
+            from IPython.display import display
+            display(self)
+            plt.close(self.fig)
+            return
+        plt.show()
+
+    def _render(self):
+        for (row, col), d in sorted(self.cells.items()):
+            d._render()
+        self.fig.patch.set_gid('figure-background')
+        self.rendered = True
+
+    def _draw_markers(self):
+        if not self.rendered:
+            for d in self._drawings():
+                d._draw_markers()
+            self.fig.patch.set_gid('figure-background')
+
+    def _drawings(self):
+        return [d for _, d in sorted(self.cells.items())]
+
+    def _tikz(self):
+        raise ValueError("TikZ output is not supported for a Sheet, save its cells instead")
+
+    # Save every cell to its own file, cropped to its content. The pattern
+    # is formatted with row, col and index (from 1, row by row). PNG files
+    # are cut from a single raster of the sheet; vector files are saved with
+    # the other cells hidden.
+    def save_cells(self, pattern, dpi=None):
+        plt.margins(x=0, y=0, tight=True)
+        dpi = dpi or self.fig.dpi
+        renderer = self.fig.canvas.get_renderer()
+        to_inches = self.fig.dpi_scale_trans.inverted()
+        cells = sorted(self.cells.items())
+        boxes = {pos: d.ax.get_tightbbox(renderer).transformed(to_inches)
+                 for pos, d in cells}
+        names = {(row, col): pattern.format(row=row, col=col, index=row * self.cols + col + 1)
+                 for row, col in self.cells}
+        backgrounds = [self.fig.patch] + [ax.patch for ax in self.fig.axes]
+        visible = [patch.get_visible() for patch in backgrounds]
+        for patch in backgrounds:
+            patch.set_visible(False)
+        try:
+            if os.path.splitext(pattern)[1].lower() == '.png':
+                self._save_cell_pngs(boxes, names, dpi)
+                return
+            for pos, d in cells:
+                others = [c.ax for p, c in cells if p != pos]
+                for ax in others:
+                    ax.set_visible(False)
+                try:
+                    self._savefig(names[pos], dpi=dpi, bbox_inches=boxes[pos])
+                finally:
+                    for ax in others:
+                        ax.set_visible(True)
+        finally:
+            for patch, flag in zip(backgrounds, visible):
+                patch.set_visible(flag)
+
+    def _save_cell_pngs(self, boxes, names, dpi):
+        from PIL import Image
+        buffer = io.BytesIO()
+        self._savefig(buffer, format='png', dpi=dpi)
+        buffer.seek(0)
+        height = self.fig.get_figheight() * dpi
+        with self._phase('crop'):
+            with Image.open(buffer) as image:
+                image.load()
+                for pos, box in boxes.items():
+                    crop = (int(box.x0 * dpi), int(height - box.y1 * dpi),
+                            int(round(box.x1 * dpi)), int(round(height - box.y0 * dpi)))
+                    image.crop(crop).save(names[pos], dpi=(dpi, dpi))
@@ -0,0 +1,215 @@
+import re
+import xml.etree.ElementTree as ET
+import numpy as np
+
+# Smaller SVG files from matplotlib output:
+#
+#     d.save('fig.svg', optimize=True)
+#     svg = optimize_svg(data, precision=2, tolerance=0.1)
+#
+# - polylines are simplified with Ramer-Douglas-Peucker: points closer than
+#   `tolerance` (in points, 1/72 inch) to the simplified line are dropped
+# - coordinates are rounded to `precision` decimals
+# - neighbouring lines with the same style are merged into one path
+# - metadata, indentation and the DOCTYPE are dropped
+
+SVG_NS = 'http://www.w3.org/2000/svg'
+XLINK_NS = 'http://www.w3.org/1999/xlink'
+
+PATH_TOKEN = re.compile(r'[A-Za-z]|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+# Number of arguments of the path commands written by matplotlib
+PATH_ARGS = {'M': 2, 'L': 2, 'Q': 4, 'C': 6, 'z': 0, 'Z': 0}
+TRANSLATE = re.compile(r'translate\(([^)]*)\)')
+# Ids numbered by matplotlib, e.g. line2d_12
+AUTO_ID = re.compile(r'[a-z0-9]+_\d+')
+
+
+def _tag(name):
+    return f'{{{SVG_NS}}}{name}'
+
+
+def format_number(value, precision):
+    text = f'{value:.{precision}f}'
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return '0' if text in ('-0', '') else text
+
+
+# Points of a polyline kept by Ramer-Douglas-Peucker
+def simplify(points, tolerance):
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j <= i + 1:
+            continue
+        a, b = points[i], points[j]
+        inner = points[i + 1:j] - a
+        direction = b - a
+        length = np.hypot(*direction)
+        if length == 0:
+            distance = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distance = np.abs(direction[0] * inner[:, 1] - direction[1] * inner[:, 0]) / length
+        k = int(np.argmax(distance))
+        if distance[k] > tolerance:
+            k += i + 1
+            keep[k] = True
+            stack += [(i, k), (k, j)]
+    return points[keep]
+
+
+# Parse a path written by matplotlib into [(command, [numbers])]. Returns
+# None for anything else (relative commands, arcs, ...).
+def parse_path(d):
+    tokens = PATH_TOKEN.findall(d)
+    commands = []
+    i = 0
+    while i < len(tokens):
+        command = tokens[i]
+        if command not in PATH_ARGS:
+            return None
+        n = PATH_ARGS[command]
+        args = tokens[i + 1:i + 1 + n]
+        if len(args) != n or any(arg in PATH_ARGS for arg in args):
+            return None
+        commands.append((command, [float(arg) for arg in args]))
+        i += 1 + n
+    return commands
+
+
+def optimize_path(d, precision, tolerance=None):
+    commands = parse_path(d)
+    if commands is None:
+        return d
+
+    # Simplify runs of M/L commands
+    if tolerance:
+        simplified = []
+        run = []
+
+        def flush():
+            if len(run) > 2:
+                points = simplify(np.array([args for _, args in run]), tolerance)
+                run[:] = [(run[0][0], list(points[0]))] + [('L', list(p)) for p in points[1:]]
+            simplified.extend(run)
+            run.clear()
+
+        for command, args in commands:
+            if command == 'M' or (command == 'L' and not run):
+                flush()
+                run.append((command, args))
+            elif command == 'L':
+                run.append((command, args))
+            else:
+                flush()
+                simplified.append((command, args))
+        flush()
+        commands = simplified
+
+    # Repeated L, Q, C letters may be omitted, a minus sign separates numbers
+    parts = []
+    previous = None
+    for command, args in commands:
+        numbers = ' '.join(format_number(v, precision) for v in args).replace(' -', '-')
+        if command == previous and command not in 'Mz':
+            parts.append(numbers if numbers.startswith('-') else ' ' + numbers)
+        else:
+            parts.append(command + numbers)
+        previous = command
+    return ''.join(parts)
+
+
+def _round_translate(transform, precision):
+    def round_args(match):
+        args = re.split(r'[\s,]+', match.group(1).strip())
+        try:
+            return 'translate(' + ' '.join(format_number(float(a), precision) for a in args) + ')'
+        except ValueError:
+            return match.group(0)
+    return TRANSLATE.sub(round_args, transform)
+
+
+def _compact_style(style):
+    return ';'.join(part.strip().replace(': ', ':') for part in style.split(';') if part.strip())
+
+
+# A group holding a single stroked path and nothing else, e.g. a line
+# drawn with ax.plot()
+def _single_path(group):
+    if group.tag != _tag('g') or set(group.attrib) - {'id'} or len(group) != 1:
+        return None
+    # Keep groups with stable ids (process-1-line, ...), see Drawing._set_ids()
+    if not AUTO_ID.fullmatch(group.get('id', '')):
+        return None
+    path = group[0]
+    if path.tag != _tag('path') or len(path) or 'd' not in path.attrib:
+        return None
+    # Semi-transparent strokes look different when overlaps are merged
+    if 'opacity' in path.get('style', ''):
+        return None
+    return path
+
+
+def _merge_paths(parent):
+    previous = None
+    for child in list(parent):
+        path = _single_path(child)
+        if path is None:
+            previous = None
+            continue
+        if previous is not None and \
+           {k: v for k, v in previous.attrib.items() if k != 'd'} == \
+           {k: v for k, v in path.attrib.items() if k != 'd'}:
+            previous.set('d', previous.get('d') + path.get('d'))
+            parent.remove(child)
+        else:
+            previous = path
+
+
+def optimize_svg(data, precision=2, tolerance=0.1):
+    ET.register_namespace('', SVG_NS)
+    ET.register_namespace('xlink', XLINK_NS)
+    root = ET.fromstring(data)
+
+    definitions = set()
+    for defs in root.iter(_tag('defs')):
+        definitions.update(defs.iter())
+
+    for parent in list(root.iter()):
+        for child in list(parent):
+            if child.tag == _tag('metadata'):
+                parent.remove(child)
+
+    for name in ('width', 'height'):
+        value = root.get(name, '')
+        if value.endswith('pt'):
+            root.set(name, format_number(float(value[:-2]), precision) + 'pt')
+    if 'viewBox' in root.attrib:
+        root.set('viewBox', ' '.join(format_number(float(v), precision)
+                                     for v in root.get('viewBox').split()))
+
+    for element in root.iter():
+        if element.tag not in (_tag('text'), _tag('tspan')):
+            if element.text is not None and not element.text.strip():
+                element.text = None
+            if element.tail is not None and not element.tail.strip():
+                element.tail = None
+        if 'style' in element.attrib:
+            element.set('style', _compact_style(element.get('style')))
+        if 'transform' in element.attrib:
+            element.set('transform', _round_translate(element.get('transform'), precision))
+        if element.tag == _tag('path') and 'd' in element.attrib:
+            # Glyphs and markers in <defs> are scaled when used: only round
+            element.set('d', optimize_path(element.get('d'), precision,
+                                           None if element in definitions else tolerance))
+        elif element.tag == _tag('use'):
+            for name in ('x', 'y'):
+                if name in element.attrib:
+                    element.set(name, format_number(float(element.get(name)), precision))
+
+    for parent in list(root.iter()):
+        _merge_paths(parent)
+
+    return ET.tostring(root, encoding='utf-8', xml_declaration=True)
@@ -0,0 +1,290 @@
+import numpy as np
+from matplotlib import rcParams
+from matplotlib.collections import PathCollection
+from matplotlib.colors import to_rgba
+from matplotlib.lines import Line2D
+from matplotlib.patches import FancyArrowPatch, Patch
+from matplotlib.path import Path
+from matplotlib.text import Text
+from matplotlib.transforms import Affine2D
+from .svgopt import format_number, simplify
+
+# TikZ code of a shown drawing:
+#
+#     d.save('fig.tikz')        % in LaTeX: \input{fig.tikz}
+#
+# The code is generated from the artists that Drawing.show() builds (curves,
+# arrows, dots, labels, ticks, grid and axes), so it matches the SVG output.
+# Curves are simplified within `tolerance` (in bp). Texts are written as
+# they are, so they are typeset by LaTeX with the fonts of the document.
+# Needs \usepackage{tikz} only, no libraries.
+
+# Anchors of TikZ nodes for matplotlib alignments
+VERTICAL = {'center': '', 'center_baseline': 'mid', 'baseline': 'base',
+            'top': 'north', 'bottom': 'south'}
+HORIZONTAL = {'center': '', 'left': 'west', 'right': 'east'}
+
+# Directions of tick marks (matplotlib TICKLEFT, TICKRIGHT, TICKUP, TICKDOWN)
+TICK_DIRECTIONS = {0: (-1, 0), 1: (1, 0), 2: (0, 1), 3: (0, -1)}
+
+
+# Dash patterns of named line styles, in points, as matplotlib draws them
+DASH_PATTERNS = {'--': 'lines.dashed_pattern', '-.': 'lines.dashdot_pattern',
+                 ':': 'lines.dotted_pattern'}
+
+
+def _dashes(line):
+    name = DASH_PATTERNS.get(line.get_linestyle())
+    if name is None:
+        return None
+    dashes = rcParams[name]
+    if rcParams['lines.scale_dashes']:
+        dashes = [d * line.get_linewidth() for d in dashes]
+    return dashes
+
+
+# Parts of a path, each starting with a MOVETO
+def _subpaths(path):
+    if path.codes is None:
+        return [path]
+    starts = list(np.flatnonzero(path.codes == Path.MOVETO)) + [len(path.codes)]
+    return [Path(path.vertices[i:j], path.codes[i:j]) for i, j in zip(starts, starts[1:])]
+
+
+def _num(value, precision=3):
+    return format_number(value, precision)
+
+
+def _color(color):
+    r, g, b, _ = to_rgba(color)
+    if (r, g, b) == (0, 0, 0):
+        return 'black'
+    if (r, g, b) == (1, 1, 1):
+        return 'white'
+    return '{rgb,1:red,%s;green,%s;blue,%s}' % (_num(r), _num(g), _num(b))
+
+
+def _opacity(color, option='opacity'):
+    alpha = to_rgba(color)[3]
+    return [f'{option}={_num(alpha)}'] if alpha < 1 else []
+
+
+def _anchor(text):
+    vertical = VERTICAL.get(text.get_verticalalignment(), '')
+    horizontal = HORIZONTAL.get(text.get_horizontalalignment(), '')
+    anchor = ' '.join(part for part in (vertical, horizontal) if part)
+    return anchor or 'center'
+
+
+def _options(options):
+    return '[' + ', '.join(options) + ']' if options else ''
+
+
+class TikzWriter:
+    def __init__(self, drawing, tolerance=0.1):
+        self.drawing = drawing
+        self.ax = drawing.ax
+        self.fig = drawing.fig
+        self.tolerance = tolerance
+        self.to_data = self.ax.transData.inverted()
+        # bp per data unit along x and y
+        origin, unit_x, unit_y = self.ax.transData.transform([(0, 0), (1, 0), (0, 1)])
+        self.bp = 72 / self.fig.dpi
+        self.sx = (unit_x[0] - origin[0]) * self.bp
+        self.sy = (unit_y[1] - origin[1]) * self.bp
+        self.items = []   # (clipped, code)
+
+    def point(self, x, y):
+        return f'({_num(x)},{_num(y)})'
+
+    # Display coordinates to data coordinates
+    def data(self, xy):
+        return self.to_data.transform(np.asarray(xy, dtype=float).reshape(-1, 2))
+
+    def add(self, code, clipped=False):
+        self.items.append((clipped, code))
+
+    def path_code(self, path, to_data=True, unit=''):
+        parts = []
+        for vertices, code in path.iter_segments(simplify=False, curves=True):
+            vertices = vertices.reshape(-1, 2)
+            if to_data:
+                vertices = self.data(vertices)
+            points = [f'({_num(x)}{unit},{_num(y)}{unit})' for x, y in vertices]
+            if code == Path.MOVETO:
+                parts.append(points[0])
+            elif code == Path.LINETO:
+                parts.append('-- ' + points[0])
+            elif code == Path.CURVE3:
+                parts.append(f'.. controls {points[0]} .. {points[1]}')
+            elif code == Path.CURVE4:
+                parts.append(f'.. controls {points[0]} and {points[1]} .. {points[2]}')
+            elif code == Path.CLOSEPOLY:
+                parts.append('-- cycle')
+        return ' '.join(parts)
+
+    def line(self, line):
+        xy = line.get_transform().transform(line.get_xydata())
+        xy = self.data(xy)
+        xy = xy[np.isfinite(xy).all(axis=1)]
+        if not len(xy):
+            return
+        clipped = line.get_clip_on()
+        color = line.get_color()
+
+        if line.get_linestyle() not in ('None', ' ', '') and len(xy) > 1:
+            options = [f'line width={_num(line.get_linewidth())}bp']
+            if _color(color) != 'black':
+                options.append(f'draw={_color(color)}')
+            options += _opacity(color, 'draw opacity')
+            dashes = _dashes(line)
+            if dashes:
+                pattern = ' '.join(f'{"on" if i % 2 == 0 else "off"} {_num(d)}bp'
+                                   for i, d in enumerate(dashes))
+                options.append(f'dash pattern={pattern}')
+            points = simplify(xy * (self.sx, self.sy), self.tolerance) / (self.sx, self.sy)
+            self.add(f'\\draw{_options(options)} '
+                     + ' -- '.join(self.point(x, y) for x, y in points) + ';', clipped)
+
+        marker = line.get_marker()
+        if marker not in ('None', ' ', '', None) and line.get_markersize() > 0:
+            self.markers(xy, marker, line.get_markersize(),
+                         line.get_markerfacecolor(), line.get_markeredgecolor(),
+                         line.get_markeredgewidth(), clipped)
+
+    def markers(self, xy, marker, size, facecolor, edgecolor, edgewidth, clipped):
+        r = _num(size / 2)
+        edge = f'line width={_num(edgewidth)}bp, draw={_color(edgecolor)}'
+        if marker == '|':
+            shape = f'\\draw[{edge}] (0,-{r}bp) -- (0,{r}bp)'
+        elif marker == '_':
+            shape = f'\\draw[{edge}] (-{r}bp,0) -- ({r}bp,0)'
+        else:
+            # Other markers are drawn as circles
+            shape = f'\\filldraw[{edge}, fill={_color(facecolor)}] (0,0) circle[radius={r}bp]'
+        for x, y in xy:
+            self.add(f'\\begin{{scope}}[shift={{{self.point(x, y)}}}] {shape}; \\end{{scope}}',
+                     clipped)
+
+    def patch(self, patch):
+        fill = patch.get_facecolor()
+        edge = patch.get_edgecolor()
+        width = patch.get_linewidth()
+        path = patch.get_transform().transform_path(patch.get_path())
+        if isinstance(patch, FancyArrowPatch):
+            # The path of an arrow joins the shaft and the head; only closed
+            # heads are filled ('-|>', not '->')
+            paths = _subpaths(path)
+            fillables = [path.codes is not None and path.codes[-1] == Path.CLOSEPOLY
+                         for path in paths]
+        else:
+            paths = [path]
+            fillables = [patch.get_fill()]
+        for path, fillable in zip(paths, fillables):
+            options = []
+            if width > 0 and to_rgba(edge)[3] > 0:
+                options += [f'line width={_num(width)}bp', f'draw={_color(edge)}']
+            if fillable and to_rgba(fill)[3] > 0:
+                options += [f'fill={_color(fill)}'] + _opacity(fill, 'fill opacity')
+            if not options:
+                continue
+            self.add(f'\\path{_options(options)} {self.path_code(path)};',
+                     patch.get_clip_on())
+
+    def collection(self, collection):
+        offsets = collection.get_offset_transform().transform(collection.get_offsets())
+        offsets = self.data(offsets)
+        if not len(offsets):
+            return
+        paths = collection.get_paths()
+        transforms = collection.get_transforms()
+        facecolors = collection.get_facecolors()
+        edgecolors = collection.get_edgecolors()
+        widths = collection.get_linewidths()
+        # One marker shape, size and color for all points, as drawn by Markers
+        shape = paths[0]
+        if len(transforms):
+            shape = shape.transformed(Affine2D(transforms[0]))
+        shape = Path(shape.vertices * self.bp, shape.codes)
+        options = []
+        if len(facecolors):
+            options.append(f'fill={_color(facecolors[0])}')
+        if len(edgecolors) and len(widths) and widths[0] > 0:
+            options += [f'draw={_color(edgecolors[0])}', f'line width={_num(widths[0])}bp']
+        code = self.path_code(shape, to_data=False, unit='bp')
+        if len(offsets) == 1:
+            x, y = offsets[0]
+            self.add(f'\\path[shift={{{self.point(x, y)}}}, {", ".join(options)}] {code};',
+                     collection.get_clip_on())
+        else:
+            points = ', '.join(f'{_num(x)}/{_num(y)}' for x, y in offsets)
+            self.add(f'\\foreach \\x/\\y in {{{points}}}\n'
+                     f'  \\path[shift={{(\\x,\\y)}}, {", ".join(options)}] {code};',
+                     collection.get_clip_on())
+
+    def text(self, text):
+        if not text.get_visible() or not text.get_text():
+            return
+        x, y = self.data(text.get_transform().transform(text.get_position()))[0]
+        size = text.get_fontsize()
+        options = [f'anchor={_anchor(text)}', 'inner sep=0pt',
+                   f'font=\\fontsize{{{_num(size, 1)}}}{{{_num(size * 1.2, 1)}}}\\selectfont']
+        if _color(text.get_color()) != 'black':
+            options.append(f'text={_color(text.get_color())}')
+        if text.get_rotation():
+            options.append(f'rotate={_num(text.get_rotation())}')
+        bbox = text.get_bbox_patch()
+        if bbox is not None and to_rgba(bbox.get_facecolor())[3] > 0:
+            options.append(f'fill={_color(bbox.get_facecolor())}')
+        self.add(f'\\node{_options(options)} at {self.point(x, y)} {{{text.get_text()}}};')
+
+    def axis(self, axis):
+        for tick in axis.get_major_ticks():
+            if not tick.get_visible():
+                continue
+            mark = tick.tick1line
+            length = mark.get_markersize()
+            if mark.get_visible() and length > 0 and mark.get_marker() in TICK_DIRECTIONS:
+                dx, dy = TICK_DIRECTIONS[mark.get_marker()]
+                x, y = self.data(mark.get_transform().transform(mark.get_xydata()))[0]
+                self.add(f'\\draw[line width={_num(mark.get_markeredgewidth())}bp] '
+                         f'{self.point(x, y)} -- ++({_num(dx * length)}bp,{_num(dy * length)}bp);')
+            self.text(tick.label1)
+
+    def code(self):
+        ax = self.ax
+        skip = {ax.patch, ax.title}
+        children = [a for a in ax.get_children()
+                    if a not in skip and a.get_visible()]
+        for artist in sorted(children, key=lambda a: a.get_zorder()):
+            if isinstance(artist, Line2D):
+                self.line(artist)
+            elif isinstance(artist, Patch):
+                self.patch(artist)
+            elif isinstance(artist, PathCollection):
+                self.collection(artist)
+            elif isinstance(artist, Text):
+                self.text(artist)
+            elif artist in (ax.xaxis, ax.yaxis):
+                self.axis(artist)
+
+        (x0, x1), (y0, y1) = ax.get_xlim(), ax.get_ylim()
+        lines = [f'\\begin{{tikzpicture}}[x={_num(self.sx)}bp, y={_num(self.sy)}bp]']
+        inside = False
+        for clipped, code in self.items:
+            if clipped and not inside:
+                lines.append('\\begin{scope}')
+                lines.append(f'\\clip {self.point(x0, y0)} rectangle {self.point(x1, y1)};')
+            elif not clipped and inside:
+                lines.append('\\end{scope}')
+            inside = clipped
+            lines.append(code)
+        if inside:
+            lines.append('\\end{scope}')
+        lines.append('\\end{tikzpicture}')
+        return '\n'.join(lines) + '\n'
+
+
+def tikz_code(drawing, tolerance=0.1):
+    drawing.fig.draw_without_rendering()
+    return TikzWriter(drawing, tolerance).code()
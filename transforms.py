@@ -0,0 +1,126 @@
+import copy
+import numpy as np
+from .processes import Process, State, States
+
+# A cycle drawn in p(V) coordinates, drawn again in other coordinates of an
+# ideal gas:
+#
+#     with sheet.cell(0, 0):
+#         cycle = [Iso_t().at(1, 8).to(4, 'volume').arrow().label('1', '2'),
+#                  Linear().to(1, 2).arrow(), Linear().to(1, 8).arrow()]
+#     with sheet.cell(0, 1) as d:
+#         d.set_config(xname='$T$', yname='$p$', xlim=[0, 10], ylim=[0, 10])
+#         transform(cycle, 'pT')
+#
+# The samples of the source curves are mapped point by point, so an
+# isotherm becomes a vertical line in p(T) and an isochore a line through
+# the origin, and the source curves are not evaluated again. Colors, line
+# styles, arrows, dots and labels are kept; labels are placed again, tick
+# labels (values of the source coordinates) are not copied.
+
+# Diagram names as in the text of problems ('pT' is p on the vertical axis
+# over T), and the quantities on the (horizontal, vertical) axes
+DIAGRAMS = {'pV': ('V', 'p'), 'pT': ('T', 'p'), 'VT': ('T', 'V'),
+            'rho-p': ('p', 'rho')}
+
+# Process attributes copied to the mapped process
+STYLE = ('color', 'linestyle', 'zorder', 'linewidth', 'arrow_params',
+         'dots_params', 'extra_lines')
+
+
+# Quantities at points (V, p) of nu moles of an ideal gas of mass `mass`,
+# with T = pV / (nu R) and rho = mass / V
+def state_quantities(V, p, nu_R=1, mass=1):
+    V = np.asarray(V, dtype=float)
+    p = np.asarray(p, dtype=float)
+    with np.errstate(divide='ignore'):
+        return {'V': V, 'p': p, 'T': p * V / nu_R, 'rho': mass / V}
+
+
+def _axes(diagram):
+    if isinstance(diagram, str):
+        if diagram not in DIAGRAMS:
+            raise ValueError(f"Unknown diagram '{diagram}', use one of {list(DIAGRAMS)} "
+                             f"or a pair of quantities like ('T', 'p')")
+        return DIAGRAMS[diagram]
+    return tuple(diagram)
+
+
+def map_points(V, p, diagram, nu_R=1, mass=1):
+    x_name, y_name = _axes(diagram)
+    values = state_quantities(V, p, nu_R, mass)
+    return values[x_name], values[y_name]
+
+
+# A process drawn through given points, the image of another process
+class Mapped(Process):
+    __slots__ = ('source', 'xs', 'ys')
+
+    def __init__(self, source, xs, ys):
+        super().__init__()
+        self.type = 'mapped'
+        self.source = source
+        self.xs = xs
+        self.ys = ys
+        self.start = (float(xs[0]), float(ys[0]))
+        self.end = (float(xs[-1]), float(ys[-1]))
+        for name in STYLE:
+            setattr(self, name, copy.deepcopy(getattr(source, name)))
+        for name in ('start_label', 'end_label'):
+            label = getattr(source, name)
+            if label is not None:
+                # Offsets were chosen for the source coordinates
+                setattr(self, name, {**label, 'ofst': None})
+
+    # Points along the mapped samples, t in [0, 1] over their index
+    def _curve(self, t):
+        index = np.asarray(t, dtype=float) * (len(self.xs) - 1)
+        steps = np.arange(len(self.xs))
+        return np.interp(index, steps, self.xs), np.interp(index, steps, self.ys)
+
+    def _num_samples(self, resolution=None):
+        return len(self.xs)
+
+    def _evaluate(self):
+        self.x_values, self.y_values = self.xs, self.ys
+
+    # Tangents over the first and last step of the mapped samples
+    def tangent_at_end(self):
+        x, y = self._curve(np.array([1 - 1 / (len(self.xs) - 1), 1]))
+        return (x[1] - x[0], y[1] - y[0])
+
+    def tangent_at_start(self):
+        x, y = self._curve(np.array([0, 1 / (len(self.xs) - 1)]))
+        return (x[1] - x[0], y[1] - y[0])
+
+    def plot(self, ax, config):
+        self._evaluate()
+        super().plot(ax, config)
+
+
+# Processes (and State, States) of p(V) coordinates drawn in another
+# diagram: a name from DIAGRAMS or a pair of quantities ('V', 'p', 'T',
+# 'rho'). Returns the new processes, which are added to the current drawing.
+def transform(processes, diagram, nu_R=1, mass=1):
+    mapped = []
+    for process in processes:
+        if isinstance(process, States):
+            xs, ys = map_points(process.xs, process.ys, diagram, nu_R, mass)
+            new = States(xs, ys, labels=process.labels)
+            new.draw_dot = process.draw_dot
+            new.dot_params = dict(process.dot_params)
+        elif isinstance(process, State):
+            x, y = map_points(*process.start, diagram, nu_R, mass)
+            new = State().at(float(x), float(y))
+            new.draw_dot = process.draw_dot
+            new.dot_params = dict(process.dot_params)
+            if process.start_label is not None:
+                new.start_label = {**process.start_label, 'ofst': None}
+        else:
+            process._ensure_samples()
+            if process.x_values is None:
+                raise ValueError(f"Process '{process.type}' has no points to transform.")
+            xs, ys = map_points(process.x_values, process.y_values, diagram, nu_R, mass)
+            new = Mapped(process, xs, ys)
+        mapped.append(new)
+    return mapped